@@ -142,6 +142,63 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static'] # Additional static files directory
 STATIC_ROOT = BASE_DIR / 'staticfiles' # Directory for collected static files
 
+# Student face photos, stored as <student id>.jpg / .png
+FACE_DATA_DIR = BASE_DIR / 'face_data'
+
+# Stop a recognition session after this many seconds without a new recognition (0 = run full duration)
+RECOGNITION_IDLE_TIMEOUT = float(os.getenv('RECOGNITION_IDLE_TIMEOUT', '0'))
+
+# Photo samples matched per student; students with more are reduced to this many centroids (0 = keep all)
+RECOGNITION_MAX_SAMPLES = int(os.getenv('RECOGNITION_MAX_SAMPLES', '5'))
+
+# Consecutive matches of a tracked face to the same student before they are marked present
+RECOGNITION_CONFIRMATIONS = int(os.getenv('RECOGNITION_CONFIRMATIONS', '2'))
+
+# Model files of the 'dnn' face detector (OpenCV ResNet-SSD), see attendance.detectors
+DNN_FACE_PROTOTXT = os.getenv('DNN_FACE_PROTOTXT', str(BASE_DIR / 'models' / 'deploy.prototxt'))
+DNN_FACE_MODEL = os.getenv('DNN_FACE_MODEL', str(BASE_DIR / 'models' / 'res10_300x300_ssd_iter_140000.caffemodel'))
+DNN_FACE_CONFIDENCE = float(os.getenv('DNN_FACE_CONFIDENCE', '0.5'))
+DNN_INPUT_WIDTH = int(os.getenv('DNN_INPUT_WIDTH', '640'))  # larger finds smaller faces at a higher cost
+# Cascade file of the 'haar' face detector (default: the one bundled with opencv-python)
+HAAR_CASCADE = os.getenv('HAAR_CASCADE', '')
+# The 'auto' detector uses HOG up to this detection width and the DNN above it
+AUTO_HOG_MAX_WIDTH = int(os.getenv('AUTO_HOG_MAX_WIDTH', '800'))
+
+# Threads consuming camera frames for detection/encoding in each session
+RECOGNITION_WORKER_THREADS = int(os.getenv('RECOGNITION_WORKER_THREADS', '1'))
+
+# Worker processes for face detection/encoding in each session (0 = run in the worker threads above)
+RECOGNITION_PROCESS_WORKERS = int(os.getenv('RECOGNITION_PROCESS_WORKERS', '0'))
+
+# Processes encoding photos during bulk enrollment (0 = all cores)
+ENROLLMENT_WORKERS = int(os.getenv('ENROLLMENT_WORKERS', '0'))
+# Photos a ZIP uploaded on the Students page may hold; enrollment runs inside the request,
+# so larger archives are refused (use 'manage.py enroll_photos') instead of timing out
+WEB_ENROLL_MAX_PHOTOS = int(os.getenv('WEB_ENROLL_MAX_PHOTOS', '20'))
+# Encoding processes of an upload on the Students page, kept low so it cannot starve the web server
+WEB_ENROLL_WORKERS = int(os.getenv('WEB_ENROLL_WORKERS', '1'))
+
+# Camera connections, see attendance.connections
+CAMERA_OPEN_TIMEOUT = float(os.getenv('CAMERA_OPEN_TIMEOUT', '10'))  # seconds to wait for a camera's first frame
+CAMERA_KEEPALIVE = float(os.getenv('CAMERA_KEEPALIVE', '900'))  # seconds a persistent connection stays open between sessions
+
+# Attendance sessions a worker process runs at the same time (one per camera)
+SCHEDULER_MAX_SESSIONS = int(os.getenv('SCHEDULER_MAX_SESSIONS', '4'))
+
+# Dashboard home page: cache lifetime (seconds) and the window used for student rankings (days)
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '300'))
+DASHBOARD_RANKING_DAYS = int(os.getenv('DASHBOARD_RANKING_DAYS', '30'))
+
+# Attendance job queue, see attendance.jobs
+# Also run the job scheduler inside `manage.py runserver` (development only; use attendance_worker in production)
+ATTENDANCE_IN_PROCESS_SCHEDULER = os.getenv('ATTENDANCE_IN_PROCESS_SCHEDULER', 'false').lower() == 'true'
+ATTENDANCE_WORKER_POLL = float(os.getenv('ATTENDANCE_WORKER_POLL', '5'))  # seconds between queue polls
+ATTENDANCE_JOB_MAX_ATTEMPTS = int(os.getenv('ATTENDANCE_JOB_MAX_ATTEMPTS', '3'))
+ATTENDANCE_JOB_RETRY_DELAY = int(os.getenv('ATTENDANCE_JOB_RETRY_DELAY', '30'))  # seconds, doubled on every retry
+ATTENDANCE_JOB_MAX_DELAY = int(os.getenv('ATTENDANCE_JOB_MAX_DELAY', '900'))  # seconds late before a job counts as missed
+ATTENDANCE_JOB_STALE_AFTER = int(os.getenv('ATTENDANCE_JOB_STALE_AFTER', '60'))  # seconds without a worker heartbeat before a running job is requeued
+ATTENDANCE_SHUTDOWN_GRACE = float(os.getenv('ATTENDANCE_SHUTDOWN_GRACE', '8'))  # seconds a stopping worker waits for cancelled sessions (below docker stop's 10s)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -152,6 +209,42 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',  # Default backend
 ]
 
+# Cache backends: 'locmem' (per process), 'file' (shared by the processes of one host, stored in CACHE_DIR)
+# or 'db' (a table in the main database, shared by the web and attendance worker processes on every host)
+CACHE_DIR = os.getenv('CACHE_DIR', str(BASE_DIR / 'cache'))
+CACHE_TABLE = 'attendify_cache'  # created by the attendance migrations
+_CACHE_BACKENDS = {
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': CACHE_TABLE,
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'attendify',
+    },
+}
+# 'default' holds sessions, the admin identity and the cached dashboard figures;
+# 'shared' only holds the reports version, which every process must see bumped (attendance.reports)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+SHARED_CACHE_BACKEND = os.getenv('SHARED_CACHE_BACKEND', 'db')
+
+CACHES = {
+    'default': _CACHE_BACKENDS[CACHE_BACKEND],
+    'shared': _CACHE_BACKENDS[SHARED_CACHE_BACKEND],
+}
+
+# Sessions: 'db', 'cached_db' (cache in front of the database) or 'cache' (cache only; needs a shared cache
+# such as CACHE_BACKEND=file when running several worker processes)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+
+# Seconds the logged-in admin's identity is cached instead of read from the Admin table on every request
+ADMIN_CACHE_TIMEOUT = int(os.getenv('ADMIN_CACHE_TIMEOUT', '60'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
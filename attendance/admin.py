@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Admin, Course, Student, Camera, Attendance
+from .models import Admin, Course, Student, Camera, Attendance, AttendanceJob
 
 admin.site.register(Admin)
 admin.site.register(Course)
 admin.site.register(Student)
 admin.site.register(Camera)
 admin.site.register(Attendance)
+admin.site.register(AttendanceJob)
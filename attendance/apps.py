@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 import os
 
 
@@ -8,7 +9,9 @@ class AttendanceConfig(AppConfig):
 
     def ready(self):
         super().ready()
-        if os.environ.get("RUN_MAIN") == "true":  # Only start in main process
+        # Opt-in, and only in the runserver child process (the autoreloader sets RUN_MAIN there):
+        # gunicorn workers and attendance_worker must never run a second scheduler
+        if settings.ATTENDANCE_IN_PROCESS_SCHEDULER and os.environ.get("RUN_MAIN") == "true":
             try:
                 from .scheduler import start
                 print('Starting APScheduler...')
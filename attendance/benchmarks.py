@@ -0,0 +1,473 @@
+"""Benchmarks for recognition and attendance storage, run with `python manage.py benchmark <suite>`.
+Each suite returns a list of result dicts which the command prints as a table or JSON."""
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+import cv2
+import numpy as np
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from attendance.detectors import DETECTORS, DetectorUnavailable, get_detector
+from attendance.engine import RecognitionEngine
+from attendance.face_encodings import encoding_to_bytes, load_encodings
+from attendance.gallery import FaceGallery, ENCODING_SIZE
+from attendance.models import Attendance, AttendanceJob, AttendanceSchedule, Camera, Course, FaceEncoding, Student
+from attendance.pipeline import FramePipeline
+from attendance.records import upsert_attendance
+from attendance.replay import replay_attendance
+from attendance.tracking import iou
+
+
+def synthetic_gallery(size, tolerance=0.6, seed=0):
+    """A gallery of random unit-scale encodings with IDs 1..size."""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0, 0.1, (size, ENCODING_SIZE))
+    return FaceGallery(encodings, np.arange(1, size + 1), tolerance=tolerance)
+
+
+def synthetic_frames(count, width=640, height=480, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def bench_engine(frames=24, width=640, height=480, workers=None, gallery_size=300, **options):
+    """Frames per second of the process-pool engine for an increasing number of workers."""
+    if not workers:
+        cores = os.cpu_count() or 1
+        workers = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    gallery = synthetic_gallery(gallery_size)
+    frame_list = synthetic_frames(frames, width, height)
+    results = []
+    for count in workers:
+        with RecognitionEngine(gallery, count) as engine:
+            # Warm up every worker process before timing
+            _feed(engine, frame_list[:count], count)
+            start = time.perf_counter()
+            _feed(engine, frame_list, count)
+            elapsed = time.perf_counter() - start
+        fps = len(frame_list) / elapsed
+        results.append({
+            'suite': 'engine',
+            'workers': count,
+            'frames': len(frame_list),
+            'resolution': f"{width}x{height}",
+            'seconds': round(elapsed, 3),
+            'fps': round(fps, 2),
+            'speedup': round(fps / results[0]['fps'], 2) if results else 1.0,
+        })
+    return results
+
+
+def _feed(engine, frames, threads):
+    """Push frames through the engine from one feeding thread per slot."""
+    def feed(slot):
+        for frame in frames[slot::threads]:
+            engine.recognize(frame, slot=slot)
+
+    feeders = [threading.Thread(target=feed, args=(slot,)) for slot in range(threads)]
+    for feeder in feeders:
+        feeder.start()
+    for feeder in feeders:
+        feeder.join()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def seed_course(students, name="benchmark"):
+    """Create a course with the given number of students. Call inside a transaction."""
+    course = Course.objects.create(name=f"{name}-{time.time_ns()}")
+    Student.objects.bulk_create(
+        [Student(name=f"Student {i}", student_class=course, roll_number=str(i)) for i in range(students)],
+        batch_size=1000,
+    )
+    return course
+
+
+def bench_writes(students=None, **options):
+    """Time and count queries for writing a course's attendance, per-row vs bulk upsert.
+    All data is created inside a transaction that is rolled back."""
+    results = []
+    for size in students or [100, 1000]:
+        try:
+            with transaction.atomic():
+                course = seed_course(size)
+                camera = Camera.objects.create(name="benchmark", address="0")
+                student_ids = list(course.students.values_list('id', flat=True))
+                timestamp = timezone.now()
+                rng = np.random.default_rng(size)
+                for label, day in (('insert', date(2000, 1, 1)), ('update', date(2000, 1, 1))):
+                    statuses = {sid: 'Present' if rng.random() < 0.8 else 'Absent' for sid in student_ids}
+                    results.append(_time_write('bulk_upsert', label, size, lambda: upsert_attendance(statuses, day, camera=camera, timestamp=timestamp)))
+
+                def per_row():
+                    for sid, status in statuses.items():
+                        Attendance.objects.update_or_create(
+                            student_id=sid, date=date(2000, 1, 2),
+                            defaults={'status': status, 'camera': camera, 'timestamp': timestamp},
+                        )
+                results.append(_time_write('update_or_create', 'insert', size, per_row))
+                results.append(_time_write('update_or_create', 'update', size, per_row))
+                raise _Rollback
+        except _Rollback:
+            pass
+    return results
+
+
+def _time_write(method, phase, size, write):
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        with transaction.atomic():
+            write()
+        elapsed = time.perf_counter() - start
+    return {
+        'suite': 'writes',
+        'method': method,
+        'phase': phase,
+        'students': size,
+        'queries': len(queries),
+        'seconds': round(elapsed, 4),
+    }
+
+
+def seed_history(students, days, courses=20):
+    """Seed courses, students, attendance, schedules and jobs. Call inside a transaction.
+    Returns: tuple[Course: a seeded course, date: the last seeded day]"""
+    rng = np.random.default_rng(students)
+    per_course = max(1, students // courses)
+    course_list = [seed_course(per_course, name=f"indexes-{i}") for i in range(courses)]
+    camera = Camera.objects.create(name="benchmark", address="0")
+    student_ids = list(Student.objects.filter(student_class__in=course_list).values_list('id', flat=True))
+    last_day = date(2000, 1, 1) + timedelta(days=days - 1)
+    timestamp = timezone.now()
+
+    batch = []
+    for offset in range(days):
+        day = last_day - timedelta(days=offset)
+        presents = rng.random(len(student_ids)) < 0.8
+        batch.extend(
+            Attendance(student_id=sid, date=day, status='Present' if present else 'Absent', camera=camera, timestamp=timestamp)
+            for sid, present in zip(student_ids, presents)
+        )
+        if len(batch) >= 10000:
+            Attendance.objects.bulk_create(batch, batch_size=1000)
+            batch = []
+    Attendance.objects.bulk_create(batch, batch_size=1000)
+
+    schedules = AttendanceSchedule.objects.bulk_create(
+        [
+            AttendanceSchedule(course=course_list[i % courses], camera=camera,
+                               date=last_day - timedelta(days=i % days), time=dt_time(8 + i % 10, i % 60))
+            for i in range(days * courses)
+        ],
+        batch_size=1000,
+    )
+    AttendanceJob.objects.bulk_create(
+        [
+            AttendanceJob(schedule=None, camera=camera, course=schedule.course, date=schedule.date,
+                          run_at=timezone.make_aware(datetime.combine(schedule.date, schedule.time)),
+                          status=AttendanceJob.DONE if i % 20 else AttendanceJob.PENDING)
+            for i, schedule in enumerate(schedules)
+        ],
+        batch_size=1000,
+    )
+    return course_list[0], last_day
+
+
+def _index_names(model, column_sets):
+    """Names of the indexes on the model's table whose columns match one of the given lists."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {
+        name for name, info in constraints.items()
+        if (info['index'] or info['unique']) and not info['primary_key'] and info['columns'] in column_sets
+    }
+
+
+def bench_indexes(students=None, days=60, **options):
+    """Seed a large attendance history and check the EXPLAIN plans of the hot queries use the indexes.
+    A row with ok=False fails the benchmark command. All data is rolled back afterwards."""
+    size = (students or [2000])[0]
+    results = []
+    try:
+        with transaction.atomic():
+            course, day = seed_history(size, days)
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            now = timezone.make_aware(datetime.combine(day, dt_time(12)))
+            course_students = Student.objects.filter(student_class=course)
+            checks = [
+                # (name, queryset, model, accepted index columns)
+                ('present_on_day', Attendance.objects.filter(date=day, status='Present', student__in=course_students),
+                 Attendance, [['date', 'student_id']]),  # attendance_present_idx, the partial index on present rows
+                ('status_counts_on_day', Attendance.objects.filter(date=day, status='Absent').values('student_id'),
+                 Attendance, [['date', 'status']]),
+                ('course_by_roll_number', course_students.order_by('roll_number'),
+                 Student, [['student_class_id', 'roll_number']]),
+                ('course_by_name', course_students.order_by('name'),
+                 Student, [['student_class_id', 'name']]),
+                ('schedules_due', AttendanceSchedule.objects.filter(date=day, time__lte=now.time()).order_by('time'),
+                 AttendanceSchedule, [['date', 'time']]),
+                ('jobs_due', AttendanceJob.objects.filter(status=AttendanceJob.PENDING, run_at__lte=now).order_by('run_at'),
+                 AttendanceJob, [['status', 'run_at']]),
+            ]
+            for name, queryset, model, column_sets in checks:
+                indexes = _index_names(model, column_sets)
+                plan = queryset.explain()
+                used = sorted(index for index in indexes if index in plan)
+                start = time.perf_counter()
+                rows = len(list(queryset))
+                elapsed = time.perf_counter() - start
+                results.append({
+                    'suite': 'indexes',
+                    'query': name,
+                    'rows': rows,
+                    'seconds': round(elapsed, 4),
+                    'index': ", ".join(used) or '-',
+                    'ok': bool(used),
+                })
+            raise _Rollback
+    except _Rollback:
+        pass
+    return results
+
+
+RECALL_IOU = 0.3  # detectors draw boxes of different tightness around the same face
+
+
+def read_video(path, count):
+    """Read up to count frames (BGR) from a video file."""
+    video = cv2.VideoCapture(str(path))
+    frames = []
+    try:
+        while len(frames) < count:
+            ret, frame = video.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        video.release()
+    return frames
+
+
+def _annotations(video):
+    """Ground-truth face boxes from `<video>.json` ({"frame index": [[top, right, bottom, left], ...]}), or None."""
+    path = f"{os.path.splitext(str(video))[0]}.json"
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return {int(index): [tuple(box) for box in boxes] for index, boxes in json.load(f).items()}
+
+
+def _matched(truth, found):
+    """Number of ground-truth boxes with a detection overlapping them by RECALL_IOU (each detection used once)."""
+    remaining = list(found)
+    hits = 0
+    for box in truth:
+        best = max(remaining, key=lambda candidate: iou(box, candidate), default=None)
+        if best is not None and iou(box, best) >= RECALL_IOU:
+            remaining.remove(best)
+            hits += 1
+    return hits
+
+
+def bench_detectors(video=None, frames=24, detectors=None, reference='cnn', detection_scale=1.0, **options):
+    """Detection speed and recall of every detector backend on a fixture video.
+    Recall is measured against the boxes in `<video>.json` when it exists, and otherwise
+    against the reference detector run at full resolution. Backends whose model files are
+    missing are reported as unavailable."""
+    if not video:
+        raise ValueError("The detectors suite needs a fixture video (--video).")
+    rgb_frames = [np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in read_video(video, frames)]
+    if not rgb_frames:
+        raise ValueError(f"No frames could be read from {video}.")
+    truth = _annotations(video)
+    source = 'annotations'
+    if truth is None:
+        source = reference
+        detector = get_detector(reference)
+        truth = {index: detector.detect(frame) for index, frame in enumerate(rgb_frames)}
+    expected = sum(len(truth.get(index, [])) for index in range(len(rgb_frames)))
+    height, width = rgb_frames[0].shape[:2]
+
+    results = []
+    for name in detectors or DETECTORS:
+        row = {'suite': 'detectors', 'detector': name, 'resolution': f"{width}x{height}", 'scale': detection_scale}
+        try:
+            get_detector(name)
+        except DetectorUnavailable as e:
+            results.append({**row, 'error': str(e)})
+            continue
+        pipeline = FramePipeline(detection_scale=detection_scale, detector=name)
+        pipeline.detect(rgb_frames[0])  # load the model before timing
+        start = time.perf_counter()
+        found = [pipeline.detect(frame) for frame in rgb_frames]
+        elapsed = time.perf_counter() - start
+        hits = sum(_matched(truth.get(index, []), boxes) for index, boxes in enumerate(found))
+        detections = sum(len(boxes) for boxes in found)
+        results.append({
+            **row,
+            'frames': len(rgb_frames),
+            'seconds': round(elapsed, 3),
+            'fps': round(len(rgb_frames) / elapsed, 2),
+            'detections_per_s': round(detections / elapsed, 2),
+            'faces': detections,
+            'expected': expected,
+            'recall': round(hits / expected, 3) if expected else None,
+            'precision': round(hits / detections, 3) if detections else None,
+            'truth': source,
+        })
+    return results
+
+
+def seed_encodings(course, directory, seed=0):
+    """Give every student of the course a random stored encoding and an (empty) photo file
+    in directory with a matching mtime, so load_encodings takes its cached path."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for student_id in course.students.values_list('id', flat=True):
+        path = os.path.join(directory, f"{student_id}.jpg")
+        open(path, 'wb').close()
+        rows.append(FaceEncoding(
+            student_id=student_id, source=f"{student_id}.jpg", image_hash='', image_mtime=os.stat(path).st_mtime,
+            encoding=encoding_to_bytes(rng.normal(0, 0.1, ENCODING_SIZE)),
+        ))
+    FaceEncoding.objects.bulk_create(rows, batch_size=1000)
+
+
+def write_video(path, frames, fps=10):
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def face_boxes(width, height, faces):
+    """A row of `faces` square boxes across the middle of the frame, used to time the encoding
+    of frames in which the detector finds nothing (synthetic frames have no real faces)."""
+    side = min(height // 3, width // max(faces, 1))
+    top = (height - side) // 2
+    return [(top, (i + 1) * side, top + side, i * side) for i in range(faces)]
+
+
+def _latency(gallery, metric, samples):
+    """A result row summarising a list of durations in seconds."""
+    samples = np.asarray(samples) * 1000
+    return {
+        'suite': 'recognition',
+        'gallery': gallery,
+        'metric': metric,
+        'count': len(samples),
+        'mean_ms': round(float(samples.mean()), 3) if len(samples) else None,
+        'p50_ms': round(float(np.percentile(samples, 50)), 3) if len(samples) else None,
+        'p95_ms': round(float(np.percentile(samples, 95)), 3) if len(samples) else None,
+    }
+
+
+def bench_recognition(gallery_sizes=None, frames=24, width=640, height=480, faces=4, video=None,
+                      detectors=None, detection_scale=1.0, **options):
+    """Recognition cost for synthetic galleries of increasing size:
+    - gallery_load: load_encodings plus building the FaceGallery for a seeded course
+    - detect, encode: per-frame latency of the pipeline stages (encode covers `faces` faces)
+    - match: per-frame latency of matching those faces against the gallery
+    - session: end-to-end replay of the frame stream (throughput in processed frames/s)
+    - db_insert, db_update: writing the course's attendance as take_attendance does
+    Frames come from --video when given, otherwise random noise. All data is rolled back."""
+    rgb_frames = None
+    if video:
+        bgr_frames = read_video(video, frames)
+        if not bgr_frames:
+            raise ValueError(f"No frames could be read from {video}.")
+    else:
+        bgr_frames = synthetic_frames(frames, width, height)
+    rgb_frames = [np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in bgr_frames]
+    height, width = rgb_frames[0].shape[:2]
+    detector = (detectors or ['hog'])[0]
+    pipeline = FramePipeline(detection_scale=detection_scale, detector=detector)
+    pipeline.detect(rgb_frames[0])  # load the model before timing
+
+    # Detection and encoding do not depend on the gallery
+    results = []
+    detect_times, encode_times, frame_faces = [], [], []
+    for frame in rgb_frames:
+        start = time.perf_counter()
+        locations = pipeline.detect(frame)
+        detect_times.append(time.perf_counter() - start)
+        locations = locations or face_boxes(width, height, faces)
+        start = time.perf_counter()
+        frame_faces.append(pipeline.encode(frame, locations))
+        encode_times.append(time.perf_counter() - start)
+    results.append(_latency('-', 'detect', detect_times))
+    results.append(_latency('-', 'encode', encode_times))
+
+    with tempfile.TemporaryDirectory() as directory:
+        video_path = os.path.join(directory, 'frames.avi')
+        write_video(video_path, bgr_frames)
+        face_dir = os.path.join(directory, 'face_data')
+        for size in gallery_sizes or [100, 1000, 10000]:
+            os.makedirs(face_dir)
+            try:
+                with transaction.atomic(), override_settings(FACE_DATA_DIR=face_dir):
+                    course = seed_course(size, name="recognition")
+                    seed_encodings(course, face_dir, seed=size)
+                    students = Student.objects.filter(student_class=course)
+
+                    start = time.perf_counter()
+                    encodings, ids = load_encodings(students)
+                    gallery = FaceGallery(encodings, ids, tolerance=course.recognition_tolerance)
+                    results.append(_latency(size, 'gallery_load', [time.perf_counter() - start]))
+
+                    match_times = []
+                    for face_encodings in frame_faces:
+                        start = time.perf_counter()
+                        gallery.match(face_encodings)
+                        match_times.append(time.perf_counter() - start)
+                    results.append(_latency(size, 'match', match_times))
+
+                    stats, _, statuses = replay_attendance(
+                        video_path, course, detector=detector, detection_scale=detection_scale, gallery=gallery,
+                    )
+                    row = _latency(size, 'session', [stats.elapsed / max(stats.frames_processed, 1)])
+                    row['count'] = stats.frames_processed
+                    row['per_s'] = round(stats.frames_processed / stats.elapsed, 2) if stats.elapsed else None
+                    results.append(row)
+
+                    camera = Camera.objects.create(name="benchmark", address="0")
+                    timestamp = timezone.now()
+                    rng = np.random.default_rng(size)
+                    for metric in ('db_insert', 'db_update'):
+                        statuses = {sid: 'Present' if rng.random() < 0.8 else 'Absent' for sid in statuses}
+                        with CaptureQueriesContext(connection) as queries:
+                            start = time.perf_counter()
+                            upsert_attendance(statuses, date(2000, 1, 1), camera=camera, timestamp=timestamp)
+                            elapsed = time.perf_counter() - start
+                        row = _latency(size, metric, [elapsed])
+                        row['per_s'] = round(len(statuses) / elapsed, 1)
+                        row['queries'] = len(queries)
+                        results.append(row)
+                    raise _Rollback
+            except _Rollback:
+                pass
+            finally:
+                for name in os.listdir(face_dir):
+                    os.remove(os.path.join(face_dir, name))
+                os.rmdir(face_dir)
+    return results
+
+
+SUITES = {
+    'engine': bench_engine,
+    'writes': bench_writes,
+    'indexes': bench_indexes,
+    'detectors': bench_detectors,
+    'recognition': bench_recognition,
+}
@@ -0,0 +1,79 @@
+import threading
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger("recognition")
+
+
+class FrameGrabber:
+    """Continuously reads frames from a cv2.VideoCapture on a background thread.
+    Frames go into a bounded queue that drops the oldest frame when full, and
+    consumers take the newest frame, so recognition always works on the latest
+    picture and the camera buffer never backs up while faces are being processed."""
+
+    def __init__(self, video, maxsize=2, name="camera"):
+        self.video = video
+        self.name = name
+        self.frames = deque(maxlen=max(int(maxsize), 1))
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"frame-grabber-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def _run(self):
+        failing = False
+        while not self._stopped.is_set():
+            ret, frame = self.video.read()
+            if not ret or frame is None or frame.shape[0] == 0:
+                self.read_failures += 1
+                if not failing:
+                    logger.error(f"Camera could not read frame, camera: {self.name}")
+                    failing = True
+                time.sleep(0.01)
+                continue
+            failing = False
+            with self._condition:
+                if len(self.frames) == self.frames.maxlen:
+                    self.frames_dropped += 1
+                self.frames.append(frame)
+                self.frames_captured += 1
+                self._condition.notify()
+
+    def get(self, timeout=1.0):
+        """Take the newest queued frame, dropping the older ones, waiting up to timeout seconds.
+        Returns: np.ndarray or None when no frame arrived in time"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.frames or self._stopped.is_set(), timeout):
+                return None
+            if not self.frames:
+                return None
+            frame = self.frames.pop()
+            self.frames_dropped += len(self.frames)
+            self.frames.clear()
+            return frame
+
+    def counters(self):
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'read_failures': self.read_failures,
+        }
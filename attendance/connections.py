@@ -0,0 +1,251 @@
+"""Camera connections shared by recognition sessions.
+Each camera gets one CameraConnection that owns the cv2.VideoCapture and reads it on a
+background thread, reconnecting with backoff when the stream fails. Sessions read through a
+CameraFeed handle. Cameras with persistent_connection keep their connection open between
+sessions (for CAMERA_KEEPALIVE seconds), so back-to-back sessions skip the RTSP connect and
+keyframe wait; other cameras are disconnected when their last session ends."""
+import logging
+import threading
+import time
+
+import cv2
+from django.conf import settings
+
+logger = logging.getLogger("recognition")
+
+RECONNECT_AFTER = 5.0  # seconds without a good frame before the capture is reopened
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def parse_camera_address(address):
+    """Return int for webcam index, or str for URL/RTSP."""
+    try:
+        return int(address)
+    except (ValueError, TypeError):
+        return str(address)
+
+
+class CameraConnection:
+    """A capture kept open on a background thread that always holds the latest frame."""
+
+    def __init__(self, camera_id, address, name, persistent=False, keepalive=0):
+        self.camera_id = camera_id
+        self.address = address
+        self.name = name
+        self.persistent = persistent
+        self.keepalive = keepalive
+        self.users = 0
+        self.connects = 0
+        self.read_failures = 0
+        self.last_frame_at = None
+        self.idle_since = time.monotonic()
+        self._frame = None
+        self._seq = 0
+        self._capture = None
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"camera-{camera_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    @property
+    def closed(self):
+        return self._stopped.is_set()
+
+    @property
+    def seq(self):
+        """Sequence number of the latest frame (0 before the first)."""
+        with self._condition:
+            return self._seq
+
+    @property
+    def healthy(self):
+        """True when the capture delivered a frame within the last RECONNECT_AFTER seconds."""
+        return self.last_frame_at is not None and time.monotonic() - self.last_frame_at < RECONNECT_AFTER
+
+    def _open(self):
+        capture = cv2.VideoCapture(parse_camera_address(self.address))
+        if not capture.isOpened():
+            capture.release()
+            return None
+        self.connects += 1
+        if self.connects > 1:
+            logger.info(f"Camera reconnected: {self.name} (connection {self.connects})")
+        return capture
+
+    def _release(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def _run(self):
+        backoff = MIN_BACKOFF
+        opened_at = None
+        failing = False
+        try:
+            while not self._stopped.is_set():
+                if self._idle_expired():
+                    break
+                if self._capture is None:
+                    self._capture = self._open()
+                    if self._capture is None:
+                        logger.error(f"Camera could not be opened, camera Adress: {self.address} (retry in {backoff:.0f}s)")
+                        self._stopped.wait(backoff)
+                        backoff = min(backoff * 2, MAX_BACKOFF)
+                        continue
+                    opened_at = time.monotonic()
+
+                ret, frame = self._capture.read()
+                if not ret or frame is None or frame.shape[0] == 0:
+                    self.read_failures += 1
+                    if not failing:
+                        logger.error(f"Camera could not read frame, camera: {self.name}")
+                        failing = True
+                    # Health check: reopen a capture that stopped delivering frames
+                    if time.monotonic() - (self.last_frame_at or opened_at) > RECONNECT_AFTER:
+                        self._release()
+                        self._stopped.wait(backoff)
+                        backoff = min(backoff * 2, MAX_BACKOFF)
+                    else:
+                        time.sleep(0.01)
+                    continue
+                failing = False
+                backoff = MIN_BACKOFF
+                with self._condition:
+                    self._frame = frame
+                    self._seq += 1
+                    self.last_frame_at = time.monotonic()
+                    self._condition.notify_all()
+        finally:
+            self._release()
+            self._stopped.set()
+            with _lock:
+                if _connections.get(self.camera_id) is self:
+                    del _connections[self.camera_id]
+
+    def _idle_expired(self):
+        """Whether the connection should close for lack of users. The decision is marked as
+        closed under the lock, so acquire() cannot hand out a connection that is exiting."""
+        with _lock:
+            if self.users:
+                return False
+            if self.persistent and time.monotonic() - self.idle_since <= self.keepalive:
+                return False
+            self._stopped.set()
+            return True
+
+    def wait_frame(self, after_seq, timeout):
+        """Wait for a frame newer than after_seq.
+        Returns: tuple[int: sequence number, np.ndarray or None]"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > after_seq or self._stopped.is_set(), timeout)
+            if self._seq > after_seq:
+                return self._seq, self._frame
+            return after_seq, None
+
+
+class CameraFeed:
+    """A session's handle on a shared connection, with the read/isOpened/release
+    interface of cv2.VideoCapture so FrameGrabber can consume it."""
+
+    def __init__(self, connection, read_timeout=1.0):
+        self.connection = connection
+        self.read_timeout = read_timeout
+        # Start after the frame the connection holds: on a reused connection it was captured
+        # before this session began, so the first read waits for a new one
+        self._seq = connection.seq
+        self._released = False
+
+    def wait_ready(self, timeout):
+        """Wait until the connection delivers its first frame. Returns: bool"""
+        deadline = time.monotonic() + timeout
+        while not self.connection.healthy and not self.connection.closed and time.monotonic() < deadline:
+            self.connection.wait_frame(0, min(0.1, max(deadline - time.monotonic(), 0)))
+        return self.connection.healthy
+
+    def isOpened(self):
+        return not self._released and not self.connection.closed
+
+    def read(self):
+        self._seq, frame = self.connection.wait_frame(self._seq, self.read_timeout)
+        return frame is not None, frame
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        # Decided under the lock like _idle_expired: once marked closed and unregistered,
+        # acquire() opens a new connection instead of handing out this one
+        with _lock:
+            self.connection.users -= 1
+            closing = self.connection.users == 0 and not self.connection.persistent
+            if self.connection.users == 0:
+                self.connection.idle_since = time.monotonic()
+            if closing:
+                self.connection._stopped.set()
+                if _connections.get(self.connection.camera_id) is self.connection:
+                    del _connections[self.connection.camera_id]
+        if closing:
+            self.connection.close()
+
+
+def acquire(camera):
+    """Return a CameraFeed for the camera, reusing its open connection when there is one.
+    A connection whose address or persistence changed is replaced."""
+    keepalive = settings.CAMERA_KEEPALIVE
+    with _lock:
+        connection = _connections.get(camera.id)
+        if connection is not None and (
+            connection.closed or connection.address != camera.address or connection.persistent != camera.persistent_connection
+        ):
+            # Camera settings changed: the old connection closes once its sessions release it
+            del _connections[camera.id]
+            connection.persistent = False
+            connection = None
+        if connection is None:
+            connection = CameraConnection(camera.id, camera.address, camera.name,
+                                          persistent=camera.persistent_connection, keepalive=keepalive)
+            _connections[camera.id] = connection
+            connection.users += 1
+            connection.start()
+        else:
+            connection.users += 1
+            logger.info(f"Reusing open connection to camera: {camera.name}")
+    return CameraFeed(connection)
+
+
+def close_all():
+    """Close every connection, e.g. when a worker shuts down."""
+    with _lock:
+        connections = list(_connections.values())
+        _connections.clear()
+    for connection in connections:
+        connection.close()
+
+
+def open_connections():
+    """Health of the open connections, keyed by camera ID."""
+    with _lock:
+        connections = list(_connections.values())
+    return {
+        connection.camera_id: {
+            'healthy': connection.healthy,
+            'users': connection.users,
+            'connects': connection.connects,
+            'read_failures': connection.read_failures,
+        }
+        for connection in connections
+    }
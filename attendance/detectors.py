@@ -0,0 +1,139 @@
+"""Face detector backends for the recognition pipeline, selectable per camera.
+Every detector takes an RGB frame and returns (top, right, bottom, left) boxes like
+face_recognition.face_locations, so the encoding step works unchanged.
+
+- hog: dlib HOG (face_recognition default); accurate on frontal faces of ~80px and up,
+  cost grows with the number of pixels.
+- cnn: dlib CNN (face_recognition model="cnn"); finds small and turned faces, very slow without a GPU.
+- dnn: OpenCV DNN ResNet-SSD on the CPU; finds small faces at a cost that depends on
+  DNN_INPUT_WIDTH rather than the frame size. Needs the model files (see settings).
+- haar: OpenCV Haar cascade; the cheapest, with more false positives.
+- auto: hog on frames up to AUTO_HOG_MAX_WIDTH pixels wide, dnn on larger ones (hog if the
+  DNN model is not installed)."""
+import logging
+import os
+
+import cv2
+import numpy as np
+import face_recognition
+from django.conf import settings
+
+from attendance.models import Camera
+
+logger = logging.getLogger("recognition")
+
+DETECTORS = [name for name, _ in Camera.DETECTOR_CHOICES]
+
+
+class DetectorUnavailable(Exception):
+    """The detector's model files are missing."""
+
+
+class HogDetector:
+    model = "hog"
+
+    def detect(self, rgb_frame):
+        return face_recognition.face_locations(rgb_frame, model=self.model)
+
+
+class CnnDetector(HogDetector):
+    model = "cnn"
+
+
+class DnnDetector:
+    """ResNet-10 SSD face detector run through cv2.dnn. The frame is resized to
+    `input_width` pixels wide (keeping its aspect ratio) before inference."""
+
+    MEAN = (104.0, 177.0, 123.0)
+
+    def __init__(self, prototxt=None, model=None, confidence=None, input_width=None):
+        prototxt = prototxt or settings.DNN_FACE_PROTOTXT
+        model = model or settings.DNN_FACE_MODEL
+        if not (os.path.isfile(prototxt) and os.path.isfile(model)):
+            raise DetectorUnavailable(f"DNN face model not found: {prototxt}, {model}")
+        self.net = cv2.dnn.readNetFromCaffe(str(prototxt), str(model))
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.confidence = settings.DNN_FACE_CONFIDENCE if confidence is None else confidence
+        self.input_width = input_width or settings.DNN_INPUT_WIDTH
+
+    def detect(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        input_width = min(width, self.input_width)
+        # The SSD is fully convolutional; sizes that are multiples of 32 keep the anchors aligned
+        size = (max(32, input_width // 32 * 32), max(32, int(height * input_width / width) // 32 * 32))
+        blob = cv2.dnn.blobFromImage(rgb_frame, 1.0, size, self.MEAN, swapRB=True, crop=False)
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        locations = []
+        for _, _, confidence, x1, y1, x2, y2 in detections:
+            if confidence < self.confidence:
+                continue
+            left, top = max(int(x1 * width), 0), max(int(y1 * height), 0)
+            right, bottom = min(int(x2 * width), width), min(int(y2 * height), height)
+            if right > left and bottom > top:
+                locations.append((top, right, bottom, left))
+        return locations
+
+
+class HaarDetector:
+    def __init__(self, cascade=None, min_size=24):
+        cascade = cascade or settings.HAAR_CASCADE or os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        if not os.path.isfile(cascade):
+            raise DetectorUnavailable(f"Haar cascade not found: {cascade}")
+        self.classifier = cv2.CascadeClassifier(cascade)
+        self.min_size = (min_size, min_size)
+
+    def detect(self, rgb_frame):
+        grey = cv2.equalizeHist(cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY))
+        boxes = self.classifier.detectMultiScale(grey, scaleFactor=1.1, minNeighbors=5, minSize=self.min_size)
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in np.reshape(boxes, (-1, 4))]
+
+
+class AutoDetector:
+    """HOG for small frames, where it is accurate and cheap, and the DNN for large frames,
+    where HOG is slow and misses the small faces at the back of the room."""
+
+    def __init__(self, max_hog_width=None):
+        self.max_hog_width = max_hog_width or settings.AUTO_HOG_MAX_WIDTH
+        self.hog = HogDetector()
+        try:
+            self.dnn = DnnDetector()
+        except DetectorUnavailable as e:
+            logger.warning(f"Auto detector falls back to HOG: {e}")
+            self.dnn = None
+
+    def detect(self, rgb_frame):
+        if self.dnn is not None and rgb_frame.shape[1] > self.max_hog_width:
+            return self.dnn.detect(rgb_frame)
+        return self.hog.detect(rgb_frame)
+
+
+_BACKENDS = {
+    'hog': HogDetector,
+    'cnn': CnnDetector,
+    'dnn': DnnDetector,
+    'haar': HaarDetector,
+    'auto': AutoDetector,
+}
+
+
+def get_detector(name):
+    """Create a detector by name. Detectors hold native models and are not thread-safe,
+    so every thread or process should create its own.
+    Raises: ValueError for an unknown name, DetectorUnavailable if its model files are missing"""
+    try:
+        backend = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown face detector '{name}', expected one of: {', '.join(DETECTORS)}")
+    return backend()
+
+
+def detector_or_hog(name):
+    """get_detector that falls back to HOG (with a logged error) when the model files are missing,
+    so a misconfigured camera still takes attendance."""
+    try:
+        return get_detector(name)
+    except DetectorUnavailable as e:
+        logger.error(f"{e}; using the HOG detector")
+        return HogDetector()
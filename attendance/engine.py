@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import django
+import numpy as np
+
+from attendance.gallery import FaceGallery
+
+logger = logging.getLogger("recognition")
+
+# Per-process state of pool workers, set up once by _init_worker
+_gallery = None
+_pipeline = None
+_attached = {}
+
+
+def process_context():
+    """Start method for worker pools. Sessions run on threads (grabber, workers, scheduler),
+    and a forked child inherits their locks in whatever state they were, so pool processes
+    are started fresh: through a fork server where available, spawned otherwise."""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def _init_worker(matrix, ids, tolerance, detection_scale, detector):
+    global _gallery, _pipeline
+    # A fresh process has no app registry yet, and the pipeline's detectors import attendance.models
+    django.setup()
+    from attendance.pipeline import FramePipeline
+
+    _gallery = FaceGallery(matrix, ids, tolerance=tolerance)
+    _pipeline = FramePipeline(detection_scale=detection_scale, detector=detector)
+
+
+def _shared_frame(name, shape, dtype):
+    block = _attached.get(name)
+    if block is None:
+        block = _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _recognize_shared(name, shape, dtype):
+    """Run detection, encoding and matching on a frame stored in shared memory."""
+    face_locations, face_encodings = _pipeline.process(_shared_frame(name, shape, dtype))
+    return face_locations, _gallery.match(face_encodings)
+
+
+def _detect_shared(name, shape, dtype):
+    _, face_locations = _pipeline.detect_frame(_shared_frame(name, shape, dtype))
+    return face_locations
+
+
+def _match_shared(name, shape, dtype, face_locations):
+    """Encode and match only the given faces of the frame in shared memory."""
+    rgb_frame = np.ascontiguousarray(cv2.cvtColor(_shared_frame(name, shape, dtype), cv2.COLOR_BGR2RGB))
+    return _gallery.match(_pipeline.encode(rgb_frame, face_locations))
+
+
+class RecognitionEngine:
+    """Process pool that runs face detection, encoding and matching on all CPU cores.
+    Every worker process gets the course gallery once through the pool initializer,
+    and frames are handed over through one shared-memory block per slot instead of
+    being pickled. Each caller thread should use its own slot."""
+
+    def __init__(self, gallery, workers, detection_scale=1.0, detector="hog"):
+        self.workers = max(int(workers), 1)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=process_context(),
+            initializer=_init_worker,
+            initargs=(gallery.matrix, gallery.ids, gallery.tolerance, detection_scale, detector),
+        )
+        self._blocks = {}
+        self._frames = {}  # slot -> (shared memory name, shape, dtype) of the last frame
+
+    def _block_for(self, slot, nbytes):
+        block = self._blocks.get(slot)
+        if block is None or block.size < nbytes:
+            if block is not None:
+                block.close()
+                block.unlink()
+            block = self._blocks[slot] = shared_memory.SharedMemory(create=True, size=nbytes)
+        return block
+
+    def _share(self, frame, slot):
+        frame = np.ascontiguousarray(frame)
+        block = self._block_for(slot, frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=block.buf)[...] = frame
+        self._frames[slot] = (block.name, frame.shape, frame.dtype.str)
+        return self._frames[slot]
+
+    def recognize(self, frame, slot=0):
+        """Detect, encode and match the faces of a BGR frame in a worker process.
+        Returns: tuple[list: face locations, list[tuple[int or None, float]]: matches]"""
+        return self.executor.submit(_recognize_shared, *self._share(frame, slot)).result()
+
+    def detect(self, frame, slot=0):
+        """Detect the faces of a BGR frame in a worker process, keeping the frame in the
+        slot's shared memory for a following match_faces call.
+        Returns: list: face locations"""
+        return self.executor.submit(_detect_shared, *self._share(frame, slot)).result()
+
+    def match_faces(self, face_locations, slot=0):
+        """Encode and match the given faces of the slot's last detected frame.
+        Returns: list[tuple[int or None, float]]"""
+        if not face_locations:
+            return []
+        return self.executor.submit(_match_shared, *self._frames[slot], face_locations).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
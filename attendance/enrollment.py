@@ -0,0 +1,223 @@
+"""Bulk enrollment of student face photos from a ZIP archive.
+Entries are read one at a time (nothing is extracted to disk), encoded in a process pool
+and only photos with exactly one face are stored as the student's photo samples and encodings."""
+import hashlib
+import io
+import logging
+import os
+import posixpath
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+import face_recognition
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from PIL import Image
+
+from attendance.engine import process_context
+from attendance.face_encodings import encoding_to_bytes, face_data_dir, sample_files, IMAGE_EXTENSIONS
+from attendance.models import Course, FaceEncoding, Student
+
+logger = logging.getLogger("recognition")
+
+PHOTO_EXTENSIONS = IMAGE_EXTENSIONS + ('.jpeg',)
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+MAX_PHOTO_SIDE = 1600  # Larger photos are downscaled before detection
+ENROLL_BATCH_SIZE = 200
+
+
+class EnrollmentReport:
+    """Outcome of a bulk enrollment: number of students enrolled, entries that matched
+    no student (skipped) and photos that were rejected (errors), each with a reason."""
+
+    def __init__(self):
+        self.enrolled = 0
+        self.skipped = []  # (entry name, reason)
+        self.errors = []  # (entry name, reason)
+
+    def __str__(self):
+        return f"Enrolled {self.enrolled} photos, skipped {len(self.skipped)}, rejected {len(self.errors)}."
+
+
+def encode_photo(data):
+    """Find the single face in an image and encode it. Runs in a pool worker.
+    Args:
+        data (bytes): Image file contents
+        Returns: tuple[bytes or None: encoding, str or None: rejection reason]"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image = image.convert('RGB')
+    except Exception:
+        return None, "Not a readable image"
+    image.thumbnail((MAX_PHOTO_SIDE, MAX_PHOTO_SIDE))
+    rgb = np.asarray(image)
+    locations = face_recognition.face_locations(rgb)
+    if not locations:
+        return None, "No face found"
+    if len(locations) > 1:
+        return None, f"{len(locations)} faces found, expected one"
+    encodings = face_recognition.face_encodings(rgb, known_face_locations=locations)
+    return encoding_to_bytes(encodings[0]), None
+
+
+def default_workers():
+    return settings.ENROLLMENT_WORKERS or os.cpu_count() or 1
+
+
+def _photo_entries(archive, report):
+    for info in archive.infolist():
+        name = info.filename
+        base = posixpath.basename(name)
+        if info.is_dir() or name.startswith('__MACOSX/') or base.startswith('.'):
+            continue
+        if os.path.splitext(base)[1].lower() not in PHOTO_EXTENSIONS:
+            report.skipped.append((name, "Not a JPG or PNG image"))
+            continue
+        if info.file_size > MAX_PHOTO_BYTES:
+            report.errors.append((name, f"Larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB"))
+            continue
+        yield info
+
+
+def _student_lookup(course_id=None, photo_map=None):
+    """Build a function mapping a ZIP entry name to a student ID (or None).
+    photo_map matches entry file names exactly; otherwise the file name is the roll number,
+    optionally with a _<n> suffix for extra samples (12.jpg, 12_2.jpg), inside a folder
+    named after the course unless a course is given."""
+    if photo_map is not None:
+        return lambda name: photo_map.get(name, photo_map.get(posixpath.basename(name)))
+
+    def rolls_for(name):
+        stem = os.path.splitext(posixpath.basename(name))[0].strip()
+        base, _, suffix = stem.rpartition('_')
+        return [stem, base] if base and suffix.isdigit() else [stem]
+
+    def first(found):
+        return next((student_id for student_id in found if student_id is not None), None)
+
+    if course_id:
+        rolls = dict(Student.objects.filter(student_class_id=course_id).values_list('roll_number', 'id'))
+        return lambda name: first(rolls.get(roll) for roll in rolls_for(name))
+
+    courses = dict(Course.objects.values_list('name', 'id'))
+    rolls = {
+        (course, roll): student_id
+        for course, roll, student_id in Student.objects.filter(student_class__isnull=False)
+        .values_list('student_class_id', 'roll_number', 'id')
+    }
+    return lambda name: first(
+        rolls.get((courses.get(posixpath.basename(posixpath.dirname(name))), roll)) for roll in rolls_for(name)
+    )
+
+
+def enroll_zip(zip_file, course_id=None, photo_map=None, workers=None, max_photos=None):
+    """Enroll the photos of a ZIP archive named by roll number (or listed in photo_map).
+    A student's accepted photos replace all of their previous samples: the first becomes
+    face_data/<id>.jpg and the others face_data/<id>_<n>.jpg, each with its encoding.
+    Args:
+        zip_file (file or str): ZIP archive
+        course_id (int): Course the roll numbers belong to (default: take it from the entry's folder)
+        photo_map (dict[str, int]): entry file name -> student ID, e.g. from the import's Photo column
+        workers (int): Encoding processes (default: ENROLLMENT_WORKERS or all cores)
+        max_photos (int): Refuse archives with more photo entries than this (default: no limit)
+        Returns: EnrollmentReport
+        Raises: zipfile.BadZipFile if the file is not a ZIP archive,
+                ValueError if it holds more than max_photos photos"""
+    report = EnrollmentReport()
+    workers = max(int(workers or default_workers()), 1)
+    store = _SampleStore()
+
+    with zipfile.ZipFile(zip_file) as archive:
+        if max_photos is not None:
+            photos = count_photos(archive)
+            if photos > max_photos:
+                raise ValueError(f"The archive has {photos} photos, more than the {max_photos} allowed here.")
+        student_for = _student_lookup(course_id, photo_map)
+        # Pool processes import this module, and with it attendance.models, so they set Django up first
+        with ProcessPoolExecutor(max_workers=workers, mp_context=process_context(), initializer=django.setup) as pool:
+            pending = {}
+
+            def collect(futures):
+                for future in futures:
+                    name, student_id, data = pending.pop(future)
+                    try:
+                        encoding, reason = future.result()
+                    except Exception as e:
+                        encoding, reason = None, f"Encoding failed ({e})"
+                    if reason:
+                        report.errors.append((name, reason))
+                        continue
+                    report.enrolled += store.add(student_id, data, encoding)
+
+            for info in _photo_entries(archive, report):
+                student_id = student_for(info.filename)
+                if student_id is None:
+                    report.skipped.append((info.filename, "No matching student"))
+                    continue
+                # Keep at most two photos per worker in memory
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                data = archive.read(info)
+                pending[pool.submit(encode_photo, data)] = (info.filename, student_id, data)
+            collect(list(pending))
+
+    report.enrolled += store.flush()
+    logger.info(f"Bulk enrollment: {report}")
+    return report
+
+
+def count_photos(archive):
+    """Number of photo entries an enrollment of an open ZipFile would encode, read from its directory."""
+    return sum(1 for _ in _photo_entries(archive, EnrollmentReport()))
+
+
+class _SampleStore:
+    """Writes each accepted photo to face_data/ as soon as it is encoded and inserts the
+    encodings in batches. The first photo of a student in this enrollment removes their
+    previous sample files and encodings."""
+
+    def __init__(self):
+        self.existing = sample_files()
+        self.counts = {}
+        self.rows = []
+        self.replaced = []
+
+    def add(self, student_id, data, encoding):
+        """Store one photo. Returns: int: encodings inserted by the batch this photo completed"""
+        folder = face_data_dir()
+        os.makedirs(folder, exist_ok=True)
+        if student_id not in self.counts:
+            self.counts[student_id] = 0
+            self.replaced.append(student_id)
+            for source in self.existing.get(student_id, {}):
+                try:
+                    os.remove(os.path.join(folder, source))
+                except FileNotFoundError:
+                    pass
+        index = self.counts[student_id]
+        self.counts[student_id] += 1
+        source = f"{student_id}.jpg" if index == 0 else f"{student_id}_{index}.jpg"
+        path = os.path.join(folder, source)
+        with open(path, 'wb') as destination:
+            destination.write(data)
+        # Same digest as face_encodings.file_hash, without reading the file back
+        self.rows.append(FaceEncoding(
+            student_id=student_id,
+            source=source,
+            image_hash=hashlib.sha1(data).hexdigest(),
+            image_mtime=os.stat(path).st_mtime,
+            encoding=encoding,
+        ))
+        return self.flush() if len(self.rows) >= ENROLL_BATCH_SIZE else 0
+
+    def flush(self):
+        """Insert the pending encodings. Returns: int: number inserted"""
+        rows, self.rows = self.rows, []
+        with transaction.atomic():
+            FaceEncoding.objects.filter(student_id__in=self.replaced).delete()
+            FaceEncoding.objects.bulk_create(rows)
+        self.replaced = []
+        return len(rows)
@@ -0,0 +1,80 @@
+"""Attendance exports over a date range, produced row by row so memory use stays flat
+regardless of how many students and days are exported."""
+import csv
+import tempfile
+from datetime import timedelta
+
+import openpyxl
+from django.http import FileResponse, StreamingHttpResponse
+
+from attendance.models import Attendance
+
+EXPORT_CHUNK_SIZE = 1000
+LAYOUTS = ('matrix', 'long')
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def attendance_rows(students, start, end, layout='matrix'):
+    """Yield the header and one row per student (matrix) or per student and day (long).
+    Students are read with a chunked iterator and their attendance fetched one chunk at a time.
+    Args:
+        students (QuerySet[Student]): Students to export, in output order
+        start (date): First day of the range
+        end (date): Last day of the range (inclusive)
+        layout (str): 'matrix' (one column per day) or 'long' (one row per student and day)"""
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    if layout == 'long':
+        yield ['Student ID', 'Name', 'Roll No', 'Date', 'Status']
+    elif len(days) == 1:
+        yield ['Student ID', 'Name', 'Roll No', 'Status']
+    else:
+        yield ['Student ID', 'Name', 'Roll No', *(day.isoformat() for day in days)]
+
+    chunk = []
+    for student in students.values_list('id', 'name', 'roll_number').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk.append(student)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield from _chunk_rows(chunk, days, layout)
+            chunk = []
+    if chunk:
+        yield from _chunk_rows(chunk, days, layout)
+
+
+def _chunk_rows(chunk, days, layout):
+    statuses = {
+        (student_id, day): status
+        for student_id, day, status in Attendance.objects.filter(
+            student_id__in=[student[0] for student in chunk], date__range=(days[0], days[-1]),
+        ).values_list('student_id', 'date', 'status')
+    }
+    for student_id, name, roll_number in chunk:
+        if layout == 'long':
+            for day in days:
+                yield [student_id, name, roll_number, day.isoformat(), statuses.get((student_id, day), '')]
+        else:
+            yield [student_id, name, roll_number, *(statuses.get((student_id, day), '') for day in days)]
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each line back instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+def csv_response(rows, filename):
+    writer = csv.writer(_Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(rows, filename):
+    """Write the rows with openpyxl's write-only mode into a temporary file and stream it back."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Attendance")
+    for row in rows:
+        ws.append(row)
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=f"{filename}.xlsx", content_type=XLSX_CONTENT_TYPE)
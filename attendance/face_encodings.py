@@ -0,0 +1,176 @@
+import hashlib
+import os
+import logging
+import re
+from collections import defaultdict
+
+import numpy as np
+import face_recognition
+from django.conf import settings
+
+from attendance.gallery import limit_samples
+from attendance.models import FaceEncoding
+
+logger = logging.getLogger("recognition")
+
+IMAGE_EXTENSIONS = ('.jpg', '.png')
+SAMPLE_NAME = re.compile(r'^(\d+)(?:_(\d+))?\.(?:jpg|png)$')
+
+
+def face_data_dir():
+    return str(settings.FACE_DATA_DIR)
+
+
+def student_image_path(student_id):
+    """Return the path of a student's main face photo, or None if there is none."""
+    for ext in IMAGE_EXTENSIONS:
+        path = os.path.join(face_data_dir(), f"{student_id}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def sample_files():
+    """Scan face_data/ once for every student's photos: the main photo <id>.jpg/.png
+    and extra samples <id>_<n>.jpg/.png.
+    Returns: dict[int: student ID, dict[str: file name, float: mtime]]"""
+    samples = defaultdict(dict)
+    try:
+        entries = list(os.scandir(face_data_dir()))
+    except FileNotFoundError:
+        return samples
+    for entry in entries:
+        match = SAMPLE_NAME.match(entry.name)
+        if match and entry.is_file():
+            samples[int(match.group(1))][entry.name] = entry.stat().st_mtime
+    return samples
+
+
+def next_sample_path(student_id):
+    """Path for a new extra sample photo of a student: face_data/<id>_<n>.jpg"""
+    taken = [int(SAMPLE_NAME.match(name).group(2) or 0) for name in sample_files().get(student_id, {})]
+    return os.path.join(face_data_dir(), f"{student_id}_{max(taken, default=0) + 1}.jpg")
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encoding_to_bytes(encoding):
+    return np.asarray(encoding, dtype=np.float64).tobytes()
+
+
+def encoding_from_bytes(data):
+    return np.frombuffer(bytes(data), dtype=np.float64)
+
+
+def _write_upload(path, image_file):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb+') as destination:
+        for chunk in image_file.chunks():
+            destination.write(chunk)
+
+
+def save_student_image(student, image_file):
+    """Write an uploaded photo to face_data/<id>.jpg and refresh the stored encoding.
+    Returns the FaceEncoding row, or None if no face was found in the photo."""
+    filepath = os.path.join(face_data_dir(), f"{student.id}.jpg")
+    _write_upload(filepath, image_file)
+    return refresh_student_encoding(student, filepath)
+
+
+def add_student_sample(student, image_file):
+    """Store an extra photo of a student (face_data/<id>_<n>.jpg) and its encoding,
+    so the student is matched against every sample.
+    Returns the FaceEncoding row, or None if no face was found in the photo."""
+    filepath = next_sample_path(student.id)
+    _write_upload(filepath, image_file)
+    return refresh_student_encoding(student, filepath)
+
+
+def refresh_student_encoding(student, path=None):
+    """(Re)compute the encoding of one of a student's photos if it changed since it was stored.
+    Args:
+        student (Student or int): student or student ID
+        path (str): photo path (default: face_data/<id>.jpg or .png)
+        Returns: FaceEncoding or None"""
+    student_id = getattr(student, 'id', student)
+    path = path or student_image_path(student_id)
+    if path is None:
+        # No main photo: forget encodings of photos that are gone
+        on_disk = sample_files().get(student_id, {})
+        FaceEncoding.objects.filter(student_id=student_id).exclude(source__in=list(on_disk)).delete()
+        return None
+
+    source = os.path.basename(path)
+    mtime = os.stat(path).st_mtime
+    image_hash = file_hash(path)
+    existing = FaceEncoding.objects.filter(student_id=student_id, source=source).first()
+    if existing and existing.image_hash == image_hash:
+        if existing.image_mtime != mtime:
+            existing.image_mtime = mtime
+            existing.save(update_fields=['image_mtime'])
+        return existing if existing.encoding else None
+
+    # This photo is new or has changed, so its stored encoding is stale
+    FaceEncoding.objects.filter(student_id=student_id, source=source).delete()
+    image = face_recognition.load_image_file(path)
+    encodings = face_recognition.face_encodings(image)
+    row = FaceEncoding.objects.create(
+        student_id=student_id,
+        source=source,
+        image_hash=image_hash,
+        image_mtime=mtime,
+        # An empty encoding remembers that this photo has no usable face
+        encoding=encoding_to_bytes(encodings[0]) if encodings else b'',
+    )
+    if not encodings:
+        logger.warning(f"No face found in photo for student ID: {student_id} ({source})")
+        return None
+    return row
+
+
+def load_encodings(students, max_samples=None):
+    """Load the stored encodings of every photo of the given students in one query.
+    Photos that were replaced on disk (mtime changed) or have no stored encoding yet are
+    encoded once and persisted; encodings of deleted photos are removed. Students with more
+    than max_samples encodings are reduced to that many centroids.
+    Args:
+        students (QuerySet[Student]): students to load
+        max_samples (int): samples kept per student (default: settings.RECOGNITION_MAX_SAMPLES)
+        Returns: tuple[list[np.ndarray]: encodings, list[int]: student IDs, one per encoding]"""
+    if max_samples is None:
+        max_samples = settings.RECOGNITION_MAX_SAMPLES
+    stored = defaultdict(dict)
+    for row_id, student_id, source, mtime, data in FaceEncoding.objects.filter(student__in=students).values_list(
+        'id', 'student_id', 'source', 'image_mtime', 'encoding'
+    ):
+        stored[student_id][source] = (row_id, mtime, data)
+    on_disk = sample_files()
+
+    known = {}
+    removed = []
+    for student_id in students.values_list('id', flat=True):
+        rows = stored.get(student_id, {})
+        photos = on_disk.get(student_id, {})
+        removed.extend(row_id for source, (row_id, _, _) in rows.items() if source not in photos)
+        samples = []
+        for source, mtime in sorted(photos.items()):
+            row = rows.get(source)
+            if row is not None and row[1] == mtime:
+                data = row[2]
+            else:
+                refreshed = refresh_student_encoding(student_id, os.path.join(face_data_dir(), source))
+                data = refreshed.encoding if refreshed else b''
+            if data:
+                samples.append(encoding_from_bytes(data))
+        if samples:
+            known[student_id] = samples
+    if removed:
+        FaceEncoding.objects.filter(id__in=removed).delete()
+
+    return limit_samples(known, max_samples)
@@ -0,0 +1,96 @@
+import numpy as np
+
+DEFAULT_TOLERANCE = 0.6  # same default as face_recognition.compare_faces
+ENCODING_SIZE = 128
+
+
+class FaceGallery:
+    """Known face encodings of a course held as one contiguous float32 matrix,
+    with a parallel array of student IDs, so every face in a frame can be
+    matched against the whole course in a single batched distance computation.
+    A student may have several rows (one per photo sample); the nearest row wins,
+    which is the minimum distance over that student's samples."""
+
+    def __init__(self, encodings, ids, tolerance=DEFAULT_TOLERANCE):
+        self.matrix = np.ascontiguousarray(
+            np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        )
+        self.ids = np.asarray(ids, dtype=np.int64)
+        if len(self.ids) != len(self.matrix):
+            raise ValueError(f"Got {len(self.matrix)} encodings but {len(self.ids)} ids")
+        self.tolerance = tolerance
+        self._squared_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def student_count(self):
+        return len(np.unique(self.ids))
+
+    def distances(self, encodings):
+        """Euclidean distance between each face encoding and each known encoding.
+        Returns: np.ndarray of shape (faces, len(gallery))"""
+        faces = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        squared = (
+            np.einsum('ij,ij->i', faces, faces)[:, None]
+            + self._squared_norms[None, :]
+            - 2.0 * (faces @ self.matrix.T)
+        )
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def match(self, encodings):
+        """Find the nearest known student for each face encoding.
+        Args:
+            encodings (list[np.ndarray]): 128-d encodings of faces in a frame
+            Returns: list[tuple[int or None: student ID, float: distance]]
+                     (student ID is None when the nearest is beyond tolerance)"""
+        if len(encodings) == 0:
+            return []
+        if len(self) == 0:
+            return [(None, float('inf'))] * len(encodings)
+        distances = self.distances(encodings)
+        nearest = distances.argmin(axis=1)
+        best = distances[np.arange(len(nearest)), nearest]
+        return [
+            (int(self.ids[index]) if distance <= self.tolerance else None, float(distance))
+            for index, distance in zip(nearest, best)
+        ]
+
+
+def cluster_samples(samples, count, iterations=10):
+    """Reduce a student's encodings to count centroids with a few rounds of k-means.
+    Centroids start from farthest-point picks, so the result is deterministic.
+    Returns: np.ndarray of shape (count, ENCODING_SIZE)"""
+    samples = np.asarray(samples, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+    if len(samples) <= count:
+        return samples
+    picks = [0]
+    nearest = np.linalg.norm(samples - samples[0], axis=1)
+    for _ in range(1, count):
+        picks.append(int(nearest.argmax()))
+        nearest = np.minimum(nearest, np.linalg.norm(samples - samples[picks[-1]], axis=1))
+    centroids = samples[picks].copy()
+    for _ in range(iterations):
+        labels = np.linalg.norm(samples[:, None, :] - centroids[None, :, :], axis=2).argmin(axis=1)
+        for k in range(count):
+            members = samples[labels == k]
+            if len(members):
+                centroids[k] = members.mean(axis=0)
+    return centroids
+
+
+def limit_samples(samples_by_student, max_samples=0):
+    """Flatten per-student encodings into gallery rows, clustering students that have
+    more than max_samples samples (0 keeps every sample).
+    Args:
+        samples_by_student (dict[int, list[np.ndarray]]): student ID -> encodings
+        max_samples (int): samples kept per student
+        Returns: tuple[list[np.ndarray]: encodings, list[int]: student IDs]"""
+    encodings, ids = [], []
+    for student_id, samples in samples_by_student.items():
+        if max_samples and len(samples) > max_samples:
+            samples = list(cluster_samples(samples, max_samples))
+        encodings.extend(samples)
+        ids.extend([student_id] * len(samples))
+    return encodings, ids
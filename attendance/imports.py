@@ -0,0 +1,95 @@
+"""Bulk student import from an XLSX roster (columns: Name | Class | Roll No, optionally Photo)."""
+import openpyxl
+from django.db import transaction
+from django.db.models import CharField
+from django.db.models.functions import Cast
+
+from attendance.models import Course, Student
+
+IMPORT_BATCH_SIZE = 1000
+REQUIRED_COLUMNS = ('Name', 'Class', 'Roll No')
+PHOTO_COLUMN = 'Photo'  # Optional: file name(s) of the student's photos in an enrollment ZIP
+
+
+class ImportReport:
+    """Outcome of an import: number of students added and the skipped/failed rows with their reason."""
+
+    def __init__(self):
+        self.added = 0
+        self.skipped = []  # (row number, reason)
+        self.errors = []  # (row number, reason)
+        self.photos = {}  # photo file name -> ID of the added student
+
+    def __str__(self):
+        return f"Imported {self.added} students, skipped {len(self.skipped)}, {len(self.errors)} errors."
+
+
+def _cell(value):
+    return str(value).strip() if value is not None else ''
+
+
+def import_students(xlsx_file, batch_size=IMPORT_BATCH_SIZE):
+    """Import students from an XLSX file in a constant number of queries per batch.
+    The workbook is streamed in read-only mode; courses and existing (course, roll number)
+    pairs are loaded once up front and new students are inserted with bulk_create.
+    Args:
+        xlsx_file (file): Uploaded XLSX file
+        batch_size (int): Students inserted per bulk_create
+        Returns: ImportReport
+        Raises: ValueError if the header row lacks one of the required columns"""
+    wb = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [_cell(value) for value in next(rows, None) or ()]
+        try:
+            indexes = [header.index(column) for column in REQUIRED_COLUMNS]
+        except ValueError:
+            raise ValueError(f"XLSX file must have columns: {', '.join(REQUIRED_COLUMNS)}.")
+        photo_idx = header.index(PHOTO_COLUMN) if PHOTO_COLUMN in header else None
+
+        courses = dict(Course.objects.values_list('name', 'id'))
+        existing = set(Student.objects.filter(student_class__isnull=False).values_list('student_class_id', 'roll_number'))
+        report = ImportReport()
+        batch = []
+        photos = []
+        for row_number, row in enumerate(rows, start=2):
+            name, class_name, roll_no = (_cell(row[i]) if i < len(row) else '' for i in indexes)
+            if not (name or class_name or roll_no):
+                continue  # Blank line
+            if not (name and class_name and roll_no):
+                report.errors.append((row_number, "Missing name, class or roll number"))
+                continue
+            course_id = courses.get(class_name)
+            if course_id is None:
+                report.errors.append((row_number, f"Unknown class '{class_name}'"))
+                continue
+            # Prevent duplicate roll numbers in the same class, including within the file
+            if (course_id, roll_no) in existing:
+                report.skipped.append((row_number, f"Roll number {roll_no} already exists in {class_name}"))
+                continue
+            existing.add((course_id, roll_no))
+            student = Student(name=name, student_class_id=course_id, roll_number=roll_no)
+            batch.append(student)
+            if photo_idx is not None and photo_idx < len(row):
+                # Several photos of one student are separated by ';'
+                photos.extend((photo.strip(), student) for photo in _cell(row[photo_idx]).split(';') if photo.strip())
+            if len(batch) >= batch_size:
+                report.added += _create_students(batch)
+                batch = []
+        if batch:
+            report.added += _create_students(batch)
+        # Students have their IDs once created
+        report.photos = {photo: student.id for photo, student in photos if student.id}
+    finally:
+        wb.close()
+    return report
+
+
+def _create_students(batch):
+    with transaction.atomic():
+        created = Student.objects.bulk_create(batch)
+        # face_id mirrors the primary key, set for the whole batch in one UPDATE
+        Student.objects.filter(id__in=[student.id for student in created if student.id]).update(
+            face_id=Cast('id', output_field=CharField()),
+        )
+    return len(created)
@@ -0,0 +1,175 @@
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from attendance.models import AttendanceJob, AttendanceSchedule
+from attendance.take_attendance import take_attendance
+
+logger = logging.getLogger("scheduler")
+
+
+def default_worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(camera_id, course_id, for_date, run_at=None, schedule=None):
+    """Queue an attendance session to be run by a worker at run_at (default: now)."""
+    return AttendanceJob.objects.create(
+        schedule=schedule,
+        camera_id=camera_id,
+        course_id=course_id,
+        date=for_date,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def sync_schedules():
+    """Create a job for every AttendanceSchedule that does not have one yet. Jobs another
+    worker created for the same schedules in the meantime are skipped by the
+    one_job_per_schedule constraint.
+    Returns: int: number of schedules that had no job"""
+    jobs = [
+        AttendanceJob(
+            schedule=schedule, camera_id=schedule.camera_id, course_id=schedule.course_id, date=schedule.date,
+            run_at=timezone.make_aware(datetime.combine(schedule.date, schedule.time)),
+        )
+        for schedule in AttendanceSchedule.objects.filter(jobs__isnull=True)
+    ]
+    AttendanceJob.objects.bulk_create(jobs, ignore_conflicts=True)
+    return len(jobs)
+
+
+def heartbeat(worker):
+    """Mark the jobs this worker is running as alive; called on every scheduler tick."""
+    return AttendanceJob.objects.filter(status=AttendanceJob.RUNNING, worker=worker).update(heartbeat_at=timezone.now())
+
+
+def requeue_jobs(jobs, message, refund=False):
+    """Put running jobs back in the queue to run now. run_at is reset so the session is not
+    counted as missed because of the time the previous worker held it.
+    Args:
+        jobs (QuerySet[AttendanceJob]): Jobs to requeue (only running ones are)
+        message (str): Reason recorded on the jobs
+        refund (bool): Do not count the interrupted run as an attempt (clean worker shutdown)
+        Returns: int: number of requeued jobs"""
+    attempts = Greatest(F('attempts') - 1, 0) if refund else F('attempts')
+    return jobs.filter(status=AttendanceJob.RUNNING).update(
+        status=AttendanceJob.PENDING, worker='', run_at=timezone.now(), heartbeat_at=None,
+        attempts=attempts, message=message,
+    )
+
+
+def expire_jobs():
+    """Fail pending jobs that are too late to be useful and requeue jobs of workers that
+    stopped sending heartbeats (crashed or killed)."""
+    now = timezone.now()
+    stale_jobs = AttendanceJob.objects.filter(
+        status=AttendanceJob.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.ATTENDANCE_JOB_STALE_AFTER),
+    )
+    # A job that keeps killing its worker must not be retried forever
+    stale_jobs.filter(attempts__gte=settings.ATTENDANCE_JOB_MAX_ATTEMPTS).update(
+        status=AttendanceJob.FAILED, message="Failed: worker stopped responding", finished_at=now,
+    )
+    stale = requeue_jobs(stale_jobs, "Requeued: worker stopped responding")
+    missed = AttendanceJob.objects.filter(
+        status=AttendanceJob.PENDING,
+        run_at__lt=now - timedelta(seconds=settings.ATTENDANCE_JOB_MAX_DELAY),
+    ).update(status=AttendanceJob.FAILED, message="Missed: no worker picked the job up in time", finished_at=now)
+    if missed or stale:
+        logger.info(f"Expired {missed} missed jobs, requeued {stale} stale jobs")
+
+
+def claim_job(worker):
+    """Atomically claim the next due job whose camera is not busy.
+    Rows locked by other workers are skipped (SELECT ... FOR UPDATE SKIP LOCKED).
+    Returns: AttendanceJob or None"""
+    busy_cameras = AttendanceJob.objects.filter(status=AttendanceJob.RUNNING).values('camera_id')
+    try:
+        with transaction.atomic():
+            job = (
+                AttendanceJob.objects.select_for_update(skip_locked=True)
+                .filter(status=AttendanceJob.PENDING, run_at__lte=timezone.now())
+                .exclude(camera_id__in=busy_cameras)
+                .order_by('run_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = AttendanceJob.RUNNING
+            job.attempts += 1
+            job.worker = worker
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'heartbeat_at'])
+            return job
+    except IntegrityError:
+        # Another worker started a session on the same camera first
+        return None
+
+
+def run_job(job, cancel=None):
+    """Run a claimed job and record the outcome, retrying with exponential backoff on failure.
+    The outcome is only saved while the job is still this worker's: a job that was requeued
+    in the meantime (worker shutdown or missed heartbeats) belongs to the queue again.
+    Args:
+        job (AttendanceJob): Job claimed by claim_job
+        cancel (threading.Event): Aborts the session, e.g. when the worker shuts down"""
+    latency = (job.started_at - job.run_at).total_seconds()
+    logger.info(f"Job {job.id}: taking attendance for camera {job.camera_id} and course {job.course_id} (attempt {job.attempts}, start latency {latency:.1f}s)")
+    try:
+        status, msg, stats = take_attendance(
+            job.camera_id, job.course_id, for_date=job.date,
+            on_progress=lambda stats: AttendanceJob.objects.filter(id=job.id, worker=job.worker).update(
+                stats=stats.as_dict(), heartbeat_at=timezone.now(),
+            ),
+            cancel=cancel,
+        )
+        stats = stats.as_dict()
+    except Exception as e:
+        logger.exception(f"Job {job.id} crashed")
+        status, msg, stats = False, str(e), None
+
+    job.message = msg
+    job.stats = stats
+    job.finished_at = timezone.now()
+    if cancel is not None and cancel.is_set() and not status:
+        requeue_jobs(AttendanceJob.objects.filter(id=job.id, worker=job.worker), "Requeued: worker shut down", refund=True)
+        logger.info(f"Job {job.id} requeued: worker shut down")
+        return job
+    if status:
+        job.status = AttendanceJob.DONE
+        logger.info(f"Job {job.id} done: {msg}")
+    elif job.attempts < settings.ATTENDANCE_JOB_MAX_ATTEMPTS:
+        delay = settings.ATTENDANCE_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.status = AttendanceJob.PENDING
+        job.run_at = timezone.now() + timedelta(seconds=delay)
+        logger.info(f"Job {job.id} failed, retrying in {delay}s: {msg}")
+    else:
+        job.status = AttendanceJob.FAILED
+        logger.info(f"Job {job.id} failed after {job.attempts} attempts: {msg}")
+    fields = ['message', 'stats', 'finished_at', 'status', 'run_at']
+    saved = AttendanceJob.objects.filter(id=job.id, status=AttendanceJob.RUNNING, worker=job.worker).update(
+        **{field: getattr(job, field) for field in fields},
+    )
+    if not saved:
+        logger.warning(f"Job {job.id} was requeued while it ran, outcome not recorded: {msg}")
+        return job
+
+    if job.status == AttendanceJob.DONE and job.schedule_id:
+        AttendanceSchedule.objects.filter(id=job.schedule_id).delete()  # Remove the schedule after completion
+    return job
+
+
+def work_once(worker):
+    """Claim and run a single job. Returns the job, or None if nothing was due."""
+    job = claim_job(worker)
+    if job is not None:
+        run_job(job)
+    return job
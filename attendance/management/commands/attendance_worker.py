@@ -0,0 +1,40 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from attendance.connections import close_all
+from attendance.jobs import default_worker_name
+from attendance.scheduler import get_executor, run_scheduled_attendance, running_sessions, stop_sessions
+
+
+class Command(BaseCommand):
+    help = "Run queued attendance jobs. Start several workers (on one or more hosts) to share the load."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=settings.ATTENDANCE_WORKER_POLL, help="Seconds between queue polls")
+        parser.add_argument('--name', default=None, help="Worker name recorded on claimed jobs")
+        parser.add_argument('--once', action='store_true', help="Run the jobs that are due now, then exit")
+
+    def handle(self, *args, **options):
+        worker = options['name'] or default_worker_name()
+        stopping = threading.Event()
+        # docker stop / systemd send SIGTERM: shut down like on Ctrl+C
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+        self.stdout.write(f"Attendance worker {worker} started")
+        try:
+            while not stopping.is_set():
+                run_scheduled_attendance(worker)
+                if options['once']:
+                    break
+                stopping.wait(options['poll'])
+        except KeyboardInterrupt:
+            stopping.set()
+        if stopping.is_set():
+            self.stdout.write(f"Stopping, cancelling {running_sessions()} running sessions...")
+            stop_sessions(worker)
+        else:
+            # --once: let the claimed sessions finish
+            get_executor().shutdown(wait=True)
+        close_all()
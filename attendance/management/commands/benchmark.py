@@ -0,0 +1,76 @@
+import json
+import os
+import platform
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from attendance.benchmarks import SUITES
+from attendance.detectors import DETECTORS
+
+
+# Options recorded in --output files
+ARGUMENTS = (
+    'frames', 'width', 'height', 'workers', 'gallery_size', 'students', 'days', 'video',
+    'detectors', 'reference', 'detection_scale', 'gallery_sizes', 'faces',
+)
+
+
+class Command(BaseCommand):
+    help = "Run a recognition benchmark suite and print the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(SUITES))
+        parser.add_argument('--frames', type=int, default=24, help="Number of synthetic frames")
+        parser.add_argument('--width', type=int, default=640)
+        parser.add_argument('--height', type=int, default=480)
+        parser.add_argument('--workers', type=int, nargs='+', help="Worker counts to compare (default: 1, 2, 4 and all cores)")
+        parser.add_argument('--gallery-size', type=int, default=300, help="Number of enrolled encodings")
+        parser.add_argument('--students', type=int, nargs='+', help="Course sizes for database suites (default: 100 1000)")
+        parser.add_argument('--days', type=int, default=60, help="Days of attendance history for the indexes suite")
+        parser.add_argument('--video', help="Fixture video for the detectors and recognition suites (ground truth from <video>.json if present)")
+        parser.add_argument('--detectors', nargs='+', choices=DETECTORS, help="Detector backends to compare (default: all; the recognition suite uses the first, default hog)")
+        parser.add_argument('--reference', choices=DETECTORS, default='cnn', help="Detector whose boxes count as ground truth without annotations")
+        parser.add_argument('--detection-scale', type=float, default=1.0, help="Downscale factor applied before detection")
+        parser.add_argument('--gallery-sizes', type=int, nargs='+', help="Gallery sizes for the recognition suite (default: 100 1000 10000)")
+        parser.add_argument('--faces', type=int, default=4, help="Faces encoded per frame when the detector finds none")
+        parser.add_argument('--json', action='store_true', help="Print results as JSON")
+        parser.add_argument('--output', help="Also write the results with environment details to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            results = SUITES[options['suite']](**options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['output']:
+            self.write_output(options, results)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        elif results:
+            self.print_table(results)
+        failed = [row for row in results if row.get('ok') is False]
+        if failed:
+            raise CommandError(f"{len(failed)} check(s) failed: {', '.join(str(row.get('query', row)) for row in failed)}")
+
+    def print_table(self, results):
+        columns = list(dict.fromkeys(column for row in results for column in row))
+        widths = [max(len(str(column)), *(len(str(row.get(column, ''))) for row in results)) for column in columns]
+        self.stdout.write("  ".join(str(column).ljust(width) for column, width in zip(columns, widths)))
+        for row in results:
+            self.stdout.write("  ".join(str(row.get(column, '')).ljust(width) for column, width in zip(columns, widths)))
+
+    def write_output(self, options, results):
+        """Write the results with what is needed to compare runs across releases and machines."""
+        document = {
+            'suite': options['suite'],
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': connection.vendor,
+            'options': {key: value for key, value in options.items() if key in ARGUMENTS},
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(document, f, indent=2)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from attendance.models import Student
+from attendance.face_encodings import load_encodings
+
+
+class Command(BaseCommand):
+    help = "Precompute face encodings for student photos in face_data/ (only changed photos are re-encoded)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help="Only encode students of this course ID")
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if options['course']:
+            students = students.filter(student_class_id=options['course'])
+
+        encodings, ids = load_encodings(students, max_samples=0)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(set(ids))} of {students.count()} students have a face encoding ({len(encodings)} photo samples)."
+        ))
@@ -0,0 +1,25 @@
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.enrollment import enroll_zip
+
+
+class Command(BaseCommand):
+    help = "Enroll student face photos from a ZIP archive of images named by roll number."
+
+    def add_arguments(self, parser):
+        parser.add_argument('zip_path', help="ZIP of <roll number>.jpg files (or <course name>/<roll number>.jpg)")
+        parser.add_argument('--course', type=int, help="Course ID the roll numbers belong to")
+        parser.add_argument('--workers', type=int, help="Encoding processes (default: ENROLLMENT_WORKERS or all cores)")
+
+    def handle(self, *args, **options):
+        try:
+            report = enroll_zip(options['zip_path'], course_id=options['course'], workers=options['workers'])
+        except (FileNotFoundError, zipfile.BadZipFile) as e:
+            raise CommandError(f"Cannot read {options['zip_path']}: {e}")
+        for name, reason in report.skipped:
+            self.stdout.write(f"Skipped {name}: {reason}")
+        for name, reason in report.errors:
+            self.stdout.write(self.style.WARNING(f"Rejected {name}: {reason}"))
+        self.stdout.write(self.style.SUCCESS(str(report)))
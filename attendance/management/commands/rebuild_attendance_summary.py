@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from attendance.reports import invalidate_reports
+from attendance.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily attendance summaries from the attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, nargs='+', help="Only rebuild these course IDs")
+
+    def handle(self, *args, **options):
+        daily = rebuild_summaries(options['course'])
+        invalidate_reports()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {daily} daily summaries."))
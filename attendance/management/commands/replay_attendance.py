@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.detectors import DETECTORS
+from attendance.models import Camera, Course
+from attendance.replay import replay_attendance
+
+
+class Command(BaseCommand):
+    help = "Run recognition for a course over a recorded video file or image directory and report per-stage timings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', help="Video file or image directory (default: the camera's address)")
+        parser.add_argument('--course', type=int, required=True, help="Course ID")
+        parser.add_argument('--camera', type=int, help="Camera ID whose pipeline settings are used")
+        parser.add_argument('--fps', type=float, help="Simulate a camera at this frame rate (default: as fast as possible)")
+        parser.add_argument('--max-frames', type=int, help="Stop after this many frames")
+        parser.add_argument('--stop-when-complete', action='store_true', help="Stop once every student was recognized")
+        parser.add_argument('--detector', choices=DETECTORS, help="Override the camera's face detector")
+        parser.add_argument('--detection-scale', type=float, help="Override the camera's detection scale")
+        parser.add_argument('--frame-interval', type=int, help="Override the camera's frame interval")
+        parser.add_argument('--write', action='store_true', help="Write the attendance rows (default: report only)")
+        parser.add_argument('--date', help="Date of written rows, YYYY-MM-DD (default: today)")
+        parser.add_argument('--json', action='store_true', help="Print the result as JSON")
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(id=options['course'])
+            camera = Camera.objects.get(id=options['camera']) if options['camera'] else None
+        except (Course.DoesNotExist, Camera.DoesNotExist):
+            raise CommandError(f"Course {options['course']} or camera {options['camera']} not found")
+        if not options['source'] and camera is None:
+            raise CommandError("Give a video file or image directory, or a --camera whose address is one.")
+        for_date = None
+        if options['date']:
+            try:
+                for_date = datetime.strptime(options['date'], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError(f"Invalid date format: {options['date']}")
+
+        try:
+            stats, timings, statuses = replay_attendance(
+                options['source'], course, camera=camera, fps=options['fps'], write=options['write'],
+                for_date=for_date, stop_when_complete=options['stop_when_complete'],
+                max_frames=options['max_frames'], detector=options['detector'],
+                detection_scale=options['detection_scale'], frame_interval=options['frame_interval'],
+            )
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+
+        present = sorted(student_id for student_id, status in statuses.items() if status == 'Present')
+        if options['json']:
+            self.stdout.write(json.dumps({'stats': stats.as_dict(), 'timings': timings, 'present': present}, indent=2))
+            return
+        self.stdout.write(self.style.SUCCESS(str(stats)))
+        self.stdout.write(f"Present: {', '.join(map(str, present)) or 'none'}")
+        self.stdout.write(
+            f"Frames: {stats.frames_captured} read, {stats.frames_dropped} dropped, "
+            f"{stats.frames_processed} processed, {stats.faces_encoded} faces encoded"
+        )
+        for name, timing in timings.items():
+            self.stdout.write(f"  {name:<12} {timing['count']:>6} x {timing['mean_ms']:>9.3f} ms = {timing['seconds']:.3f}s")
+        if options['write']:
+            self.stdout.write("Attendance written." if stats.recognized else "Nothing recognized, attendance not written.")
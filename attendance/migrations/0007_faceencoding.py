@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_rename_ip_address_camera_address_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceEncoding',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=255)),
+                ('image_hash', models.CharField(max_length=64)),
+                ('image_mtime', models.FloatField()),
+                ('encoding', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='face_encodings', to='attendance.student')),
+            ],
+            options={
+                'unique_together': {('student', 'source')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_faceencoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='recognition_tolerance',
+            field=models.FloatField(default=0.6),
+        ),
+    ]
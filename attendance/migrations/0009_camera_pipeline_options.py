@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_course_recognition_tolerance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='detection_scale',
+            field=models.FloatField(default=0.5),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='frame_interval',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='motion_threshold',
+            field=models.FloatField(default=0),
+        ),
+    ]
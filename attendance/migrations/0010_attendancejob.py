@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_camera_pipeline_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('run_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('message', models.TextField(blank=True)),
+                ('stats', models.JSONField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('camera', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='attendance.camera')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='attendance.course')),
+                ('schedule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='attendance.attendanceschedule')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('camera',), name='one_running_job_per_camera')],
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def build_summaries(apps, schema_editor):
+    Attendance = apps.get_model('attendance', 'Attendance')
+    DailyAttendanceSummary = apps.get_model('attendance', 'DailyAttendanceSummary')
+    StudentAttendanceTally = apps.get_model('attendance', 'StudentAttendanceTally')
+    counts = dict(
+        present=Count('id', filter=Q(status='Present')),
+        absent=Count('id', filter=Q(status='Absent')),
+    )
+    DailyAttendanceSummary.objects.bulk_create(
+        [
+            DailyAttendanceSummary(course_id=row['student__student_class_id'], date=row['date'],
+                                   present_count=row['present'], absent_count=row['absent'])
+            for row in Attendance.objects.filter(student__student_class__isnull=False)
+            .values('student__student_class_id', 'date').annotate(**counts).order_by()
+        ],
+        batch_size=500,
+    )
+    StudentAttendanceTally.objects.bulk_create(
+        [
+            StudentAttendanceTally(student_id=row['student_id'], present_count=row['present'], absent_count=row['absent'])
+            for row in Attendance.objects.values('student_id').annotate(**counts).order_by()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_attendancejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAttendanceTally',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('present_count', models.IntegerField(default=0)),
+                ('absent_count', models.IntegerField(default=0)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_tally', to='attendance.student')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('present_count', models.IntegerField(default=0)),
+                ('absent_count', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='attendance.course')),
+            ],
+            options={
+                'unique_together': {('course', 'date')},
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_attendance_summaries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(condition=models.Q(('status', 'Present')), fields=['date', 'student'], name='attendance_present_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancejob',
+            index=models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendanceschedule',
+            index=models.Index(fields=['date', 'time'], name='schedule_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['student_class', 'name'], name='student_class_name_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='persistent_connection',
+            field=models.BooleanField(default=False),
+        ),
+    ]
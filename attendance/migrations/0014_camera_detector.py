@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0013_camera_persistent_connection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='detector',
+            field=models.CharField(choices=[('hog', 'HOG (dlib)'), ('cnn', 'CNN (dlib, slow on CPU)'), ('dnn', 'ResNet-SSD (OpenCV DNN)'), ('haar', 'Haar cascade (OpenCV)'), ('auto', 'Auto (by resolution)')], default='hog', max_length=10),
+        ),
+    ]
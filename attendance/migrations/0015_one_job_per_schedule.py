@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+def detach_duplicate_jobs(apps, schema_editor):
+    """Keep the first job of schedules that were enqueued twice; later ones keep their history
+    but no longer point at the schedule."""
+    AttendanceJob = apps.get_model('attendance', 'AttendanceJob')
+    seen = set()
+    duplicates = []
+    for job_id, schedule_id in AttendanceJob.objects.filter(schedule__isnull=False).order_by('id').values_list('id', 'schedule_id'):
+        if schedule_id in seen:
+            duplicates.append(job_id)
+        seen.add(schedule_id)
+    AttendanceJob.objects.filter(id__in=duplicates).update(schedule=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0014_camera_detector'),
+    ]
+
+    operations = [
+        migrations.RunPython(detach_duplicate_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendancejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('schedule__isnull', False)), fields=('schedule',), name='one_job_per_schedule'),
+        ),
+    ]
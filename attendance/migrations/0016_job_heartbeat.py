@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0015_one_job_per_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancejob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
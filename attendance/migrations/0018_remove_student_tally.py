@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0017_cache_table'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='StudentAttendanceTally',
+        ),
+    ]
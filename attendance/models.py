@@ -13,15 +13,31 @@ class Course(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True, null=True)
+    recognition_tolerance = models.FloatField(default=0.6)  # max face distance counted as a match
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.name} ({self.id})"
 
 class Camera(models.Model):
+    # Face detector backends, see attendance.detectors
+    DETECTOR_CHOICES = [
+        ('hog', 'HOG (dlib)'),
+        ('cnn', 'CNN (dlib, slow on CPU)'),
+        ('dnn', 'ResNet-SSD (OpenCV DNN)'),
+        ('haar', 'Haar cascade (OpenCV)'),
+        ('auto', 'Auto (by resolution)'),
+    ]
+
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
     address = models.CharField(max_length=100)
+    # Recognition pipeline tuning, see attendance.pipeline.FramePipeline
+    detection_scale = models.FloatField(default=0.5)  # downscale factor for face detection
+    frame_interval = models.PositiveIntegerField(default=1)  # process every Nth frame
+    motion_threshold = models.FloatField(default=0)  # min mean pixel change to process a frame, 0 = off
+    persistent_connection = models.BooleanField(default=False)  # keep the stream open between sessions
+    detector = models.CharField(max_length=10, choices=DETECTOR_CHOICES, default='hog')  # face detector backend
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -37,6 +53,9 @@ class Student(models.Model):
 
     class Meta:
         unique_together = ('student_class', 'roll_number')
+        indexes = [
+            models.Index(fields=['student_class', 'name'], name='student_class_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.id} - {self.name} - {self.student_class} - {self.roll_number}"
@@ -55,6 +74,11 @@ class Attendance(models.Model):
 
     class Meta:
         unique_together = ('student', 'date')
+        indexes = [
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            # Partial index for the "present on a day" lookups (PostgreSQL/SQLite)
+            models.Index(fields=['date', 'student'], name='attendance_present_idx', condition=models.Q(status='Present')),
+        ]
 
     def __str__(self):
         return f"{self.student.name} - {self.status} - {self.date}"
@@ -67,5 +91,79 @@ class AttendanceSchedule(models.Model):
     time = models.TimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'time'], name='schedule_date_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.course.name} - {self.camera.name} - {self.date} {self.time}"
+
+class FaceEncoding(models.Model):
+    id = models.AutoField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='face_encodings')
+    source = models.CharField(max_length=255)  # file name inside FACE_DATA_DIR
+    image_hash = models.CharField(max_length=64)
+    image_mtime = models.FloatField()
+    encoding = models.BinaryField()  # 128 float64 values from face_recognition
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('student', 'source')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.source}"
+
+class AttendanceJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    id = models.AutoField(primary_key=True)
+    schedule = models.ForeignKey(AttendanceSchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    camera = models.ForeignKey(Camera, on_delete=models.CASCADE, related_name='jobs')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='jobs')
+    date = models.DateField()
+    run_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    message = models.TextField(blank=True)
+    stats = models.JSONField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # last sign of life of the worker running the job
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # A camera can only run one session at a time
+            models.UniqueConstraint(fields=['camera'], condition=models.Q(status='running'), name='one_running_job_per_camera'),
+            # Workers sync schedules concurrently; a schedule must only ever get one job
+            models.UniqueConstraint(fields=['schedule'], condition=models.Q(schedule__isnull=False), name='one_job_per_schedule'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.course.name} - {self.camera.name} - {self.run_at} ({self.status})"
+
+class DailyAttendanceSummary(models.Model):
+    id = models.AutoField(primary_key=True)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+    present_count = models.IntegerField(default=0)
+    absent_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course', 'date')
+
+    def __str__(self):
+        return f"{self.course.name} - {self.date}: {self.present_count} present, {self.absent_count} absent"
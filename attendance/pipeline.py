@@ -0,0 +1,131 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+import face_recognition
+
+from attendance.detectors import detector_or_hog
+
+MOTION_THUMBNAIL_WIDTH = 64
+
+
+class FramePipeline:
+    """Frame sampling plus downscaled detection for the recognition loop.
+    Faces are detected on a frame shrunk by `detection_scale`, the boxes are mapped
+    back to full resolution for encoding, and only every `frame_interval`-th frame
+    (and only if it differs from the last processed frame by at least
+    `motion_threshold` mean grey levels) is processed at all. Faces are found by the
+    `detector` backend (see attendance.detectors), created once per thread."""
+
+    def __init__(self, detection_scale=1.0, frame_interval=1, motion_threshold=0.0, detector="hog"):
+        self.detection_scale = detection_scale
+        self.frame_interval = max(int(frame_interval), 1)
+        self.motion_threshold = motion_threshold
+        self.detector = detector
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.faces_encoded = 0
+        self.started_at = time.monotonic()
+        self._last_thumbnail = None
+        self._lock = threading.Lock()  # shared by recognition worker threads
+        self._local = threading.local()
+
+    @classmethod
+    def for_camera(cls, camera):
+        return cls(
+            detection_scale=camera.detection_scale,
+            frame_interval=camera.frame_interval,
+            motion_threshold=camera.motion_threshold,
+            detector=camera.detector,
+        )
+
+    @property
+    def fps(self):
+        """Processed frames per second since the pipeline was created."""
+        elapsed = time.monotonic() - self.started_at
+        return self.frames_processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def read_fps(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.frames_read / elapsed if elapsed > 0 else 0.0
+
+    def should_process(self, frame):
+        """Count a frame read from the camera and decide whether it is worth processing."""
+        with self._lock:
+            return self._should_process(frame)
+
+    def _should_process(self, frame):
+        self.frames_read += 1
+        if (self.frames_read - 1) % self.frame_interval:
+            return False
+        if self.motion_threshold > 0:
+            height, width = frame.shape[:2]
+            thumbnail = cv2.resize(
+                cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
+                (MOTION_THUMBNAIL_WIDTH, max(1, height * MOTION_THUMBNAIL_WIDTH // width)),
+                interpolation=cv2.INTER_AREA,
+            )
+            if self._last_thumbnail is not None:
+                change = cv2.absdiff(thumbnail, self._last_thumbnail).mean()
+                if change < self.motion_threshold:
+                    return False
+            self._last_thumbnail = thumbnail
+        return True
+
+    def mark_processed(self):
+        with self._lock:
+            self.frames_processed += 1
+
+    @property
+    def face_detector(self):
+        """This thread's instance of the detector backend."""
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            detector = self._local.detector = detector_or_hog(self.detector)
+        return detector
+
+    def detect(self, rgb_frame):
+        """Detect faces on the downscaled frame.
+        Returns: list[tuple[int, int, int, int]] of (top, right, bottom, left) in full-resolution pixels"""
+        scale = self.detection_scale
+        if scale >= 1.0:
+            return self.face_detector.detect(rgb_frame)
+        small_frame = cv2.resize(rgb_frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        height, width = rgb_frame.shape[:2]
+        locations = []
+        for top, right, bottom, left in self.face_detector.detect(small_frame):
+            locations.append((
+                max(int(top / scale), 0),
+                min(int(right / scale), width),
+                min(int(bottom / scale), height),
+                max(int(left / scale), 0),
+            ))
+        return locations
+
+    def detect_frame(self, frame):
+        """Count a processed BGR frame and detect its faces.
+        Returns: tuple[np.ndarray: RGB frame, list: face locations]"""
+        self.mark_processed()
+        rgb_frame = np.ascontiguousarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        return rgb_frame, self.detect(rgb_frame)
+
+    def encode(self, rgb_frame, face_locations):
+        """Compute the 128-d encodings of the given faces (the expensive step).
+        Returns: list[np.ndarray]"""
+        if not face_locations:
+            return []
+        self.count_encoded(len(face_locations))
+        return face_recognition.face_encodings(rgb_frame, face_locations)
+
+    def count_encoded(self, faces):
+        """Count faces encoded for this pipeline (also called for encodings done in an engine)."""
+        with self._lock:
+            self.faces_encoded += faces
+
+    def process(self, frame):
+        """Detect and encode the faces in a BGR frame.
+        Returns: tuple[list: face locations, list[np.ndarray]: face encodings]"""
+        rgb_frame, face_locations = self.detect_frame(frame)
+        return face_locations, self.encode(rgb_frame, face_locations)
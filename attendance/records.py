@@ -0,0 +1,65 @@
+from django.db import transaction
+
+from attendance.models import Attendance
+from attendance.reports import invalidate_reports
+from attendance.summaries import apply_changes, recount
+
+WRITE_BATCH_SIZE = 500
+
+
+def upsert_attendance(statuses, for_date, camera=None, timestamp=None):
+    """Write attendance statuses for one date in a constant number of statements.
+    Existing rows are locked and fetched in one query and updated with bulk_update; missing
+    rows are inserted with bulk_create (rows inserted concurrently are updated on conflict).
+    Daily summaries are updated with the changes of the existing rows; the inserted rows'
+    previous status is unknown, so their courses' summaries for the date are recounted.
+    Args:
+        statuses (dict[int, str]): student ID -> 'Present' or 'Absent'
+        for_date (date): Attendance date
+        camera (Camera): Camera that took the attendance, if any
+        timestamp (datetime): Timestamp for updated rows (new rows get the current time)
+        Returns: int: number of rows written"""
+    if not statuses:
+        return 0
+    fields = ['status']
+    if camera is not None:
+        fields.append('camera')
+    if timestamp is not None:
+        fields.append('timestamp')
+
+    with transaction.atomic():
+        existing = (
+            Attendance.objects.filter(student_id__in=list(statuses), date=for_date)
+            .select_for_update().only('id', 'student_id', 'status')
+        )
+        to_update = []
+        changes = []
+        for record in existing:
+            changes.append((record.student_id, record.status, statuses[record.student_id]))
+            record.status = statuses[record.student_id]
+            if camera is not None:
+                record.camera = camera
+            if timestamp is not None:
+                record.timestamp = timestamp
+            to_update.append(record)
+        existing_ids = {record.student_id for record in to_update}
+        to_create = [
+            Attendance(student_id=student_id, date=for_date, status=status, camera=camera)
+            for student_id, status in statuses.items()
+            if student_id not in existing_ids
+        ]
+        if to_update:
+            Attendance.objects.bulk_update(to_update, fields, batch_size=WRITE_BATCH_SIZE)
+        if to_create:
+            Attendance.objects.bulk_create(
+                to_create,
+                batch_size=WRITE_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['student', 'date'],
+                update_fields=fields,
+            )
+        apply_changes(for_date, changes)
+        # Counted after apply_changes: recounted summaries overwrite its deltas with the totals
+        recount(for_date, [record.student_id for record in to_create])
+        transaction.on_commit(invalidate_reports)
+    return len(statuses)
@@ -0,0 +1,197 @@
+"""Offline replay of recorded video through the recognition pipeline.
+A video file or a directory of images stands in for the camera and its frames are consumed as
+fast as the pipeline allows, or at a simulated camera frame rate where frames that arrive while
+a frame is being processed are dropped like on a live stream. Used to tune and benchmark
+recognition without a camera; attendance is only written when asked."""
+import contextlib
+import logging
+import os
+import time
+from datetime import date, datetime
+
+import cv2
+from django.conf import settings
+from django.utils import timezone
+
+from attendance.face_encodings import load_encodings
+from attendance.gallery import FaceGallery
+from attendance.models import Student
+from attendance.pipeline import FramePipeline
+from attendance.records import upsert_attendance
+from attendance.take_attendance import RecognitionSession, recognize_frame
+from attendance.tracking import FaceTracker
+
+logger = logging.getLogger("recognition")
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FrameSource:
+    """Frames of a video file or an image directory (in file name order), with the read/release
+    interface of cv2.VideoCapture. With `fps`, reads follow the wall clock from the first read:
+    a read waits for the next frame's time and skips the frames whose time has passed."""
+
+    def __init__(self, path, fps=None):
+        self.path = str(path)
+        self.fps = fps
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self._position = 0
+        self._started = None
+        if os.path.isdir(self.path):
+            self._images = sorted(
+                os.path.join(self.path, name) for name in os.listdir(self.path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self._video = None
+        elif os.path.isfile(self.path):
+            self._images = None
+            self._video = cv2.VideoCapture(self.path)
+        else:
+            raise FileNotFoundError(f"No video file or image directory at {self.path}")
+
+    def isOpened(self):
+        return self._images is not None or self._video.isOpened()
+
+    def _skip(self):
+        if self._video is not None:
+            return self._video.grab()
+        return self._position < len(self._images)
+
+    def read(self):
+        if self.fps:
+            now = time.monotonic()
+            if self._started is None:
+                self._started = now
+            due = int((now - self._started) * self.fps)
+            if self._position > due:
+                time.sleep((self._position - due) / self.fps)
+            while self._position < due and self._skip():
+                self._position += 1
+                self.frames_skipped += 1
+        if self._video is not None:
+            ret, frame = self._video.read()
+        elif self._position < len(self._images):
+            frame = cv2.imread(self._images[self._position])
+            ret = frame is not None
+        else:
+            ret, frame = False, None
+        if ret:
+            self._position += 1
+            self.frames_read += 1
+        return ret, frame
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+
+
+class StageTimings:
+    """Accumulated wall time per pipeline stage."""
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def as_dict(self):
+        return {
+            name: {
+                'count': self.counts[name],
+                'seconds': round(total, 4),
+                'mean_ms': round(total / self.counts[name] * 1000, 3),
+            }
+            for name, total in self.totals.items()
+        }
+
+
+def replay_attendance(source, course, camera=None, fps=None, write=False, for_date=None,
+                      stop_when_complete=False, max_frames=None, detector=None, detection_scale=None,
+                      frame_interval=None, gallery=None):
+    """Run recognition for a course over a recorded video or image directory.
+    Args:
+        source (str or FrameSource): Video file or image directory (default: the camera's address)
+        course (Course): Course whose students are recognized
+        camera (Camera): Camera whose pipeline settings are used, and recorded on written rows
+        fps (float): Simulated camera frame rate (default: as fast as possible)
+        write (bool): Write Present/Absent rows like take_attendance does
+        for_date (date): Date of written rows (default: today)
+        stop_when_complete (bool): Stop once every enrolled student was recognized
+        max_frames (int): Stop after this many frames
+        detector, detection_scale, frame_interval: Override the camera's pipeline settings
+        gallery (FaceGallery): Use this gallery instead of loading the course's encodings
+        Returns: tuple[SessionStats, dict: per-stage timings, dict[int, str]: statuses by student ID]"""
+    timings = StageTimings()
+    students = Student.objects.filter(student_class=course)
+    if gallery is None:
+        with timings.stage('gallery'):
+            known_encodings, known_ids = load_encodings(students)
+            gallery = FaceGallery(known_encodings, known_ids, tolerance=course.recognition_tolerance)
+
+    pipeline = FramePipeline.for_camera(camera) if camera is not None else FramePipeline()
+    if detector is not None:
+        pipeline.detector = detector
+    if detection_scale is not None:
+        pipeline.detection_scale = detection_scale
+    if frame_interval is not None:
+        pipeline.frame_interval = max(int(frame_interval), 1)
+    if source is None:
+        source = camera.address
+    if not isinstance(source, FrameSource):
+        source = FrameSource(source, fps=fps)
+
+    tracker = FaceTracker(confirmations=settings.RECOGNITION_CONFIRMATIONS)
+    # No time limit: the session ends with the input (duration is only checked by session.wait)
+    session = RecognitionSession(gallery, 0, stop_when_complete=stop_when_complete)
+    first_match_frame = None
+    reason = 'end'
+    try:
+        while not session.finished.is_set():
+            if max_frames is not None and source.frames_read >= max_frames:
+                reason = 'max_frames'
+                break
+            with timings.stage('read'):
+                ret, frame = source.read()
+            if not ret:
+                break
+            if not pipeline.should_process(frame):
+                continue
+            recognize_frame(frame, pipeline, session, tracker, timings=timings)
+            if first_match_frame is None and session.recognized_ids:
+                first_match_frame = source.frames_read
+    finally:
+        source.release()
+    session.finish(reason)  # keeps 'complete' if every student was recognized
+
+    stats = session.stats
+    stats.frames_captured = source.frames_read
+    stats.frames_dropped = source.frames_skipped
+    stats.frames_read = pipeline.frames_read
+    stats.frames_processed = pipeline.frames_processed
+    stats.faces_encoded = pipeline.faces_encoded
+    stats.fps = pipeline.fps
+    stats.first_match_frame = first_match_frame
+    logger.info(f"Replay of {source.path} for course={course.name}: {stats}")
+
+    statuses = {
+        student_id: 'Present' if student_id in session.recognized_ids else 'Absent'
+        for student_id in students.values_list('id', flat=True)
+    }
+    if write and session.recognized_ids:
+        for_date = for_date or date.today()
+        timestamp = timezone.make_aware(datetime.combine(for_date, datetime.now().time()))
+        with timings.stage('db_write'):
+            upsert_attendance(statuses, for_date, camera=camera, timestamp=timestamp)
+        logger.info(f"Attendance written from replay for course={course.name}, date={for_date}")
+    return stats, timings.as_dict(), statuses
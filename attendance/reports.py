@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import Count, F, Sum
+
+from attendance.models import Attendance, DailyAttendanceSummary, Student
+
+CACHE_VERSION_KEY = 'reports:version'
+
+
+def reports_version():
+    # The version lives in the shared cache so a bump by any process (web or attendance worker)
+    # retires the figures every process cached in its own default cache
+    return caches['shared'].get_or_set(CACHE_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_reports():
+    """Drop cached dashboard data; called whenever attendance or enrollment changes."""
+    try:
+        caches['shared'].incr(CACHE_VERSION_KEY)
+    except ValueError:
+        caches['shared'].set(CACHE_VERSION_KEY, 2, timeout=None)
+
+
+def dashboard_summary(today, class_id=None):
+    """Figures for the dashboard home page, cached per (class, day) until attendance changes.
+    Returns: dict with total_students, today_attendance, absent_today, attendance_trend,
+             week_days_labels, pie_data, top_students and frequent_absentees"""
+    key = f"reports:dashboard:v{reports_version()}:{class_id or 'all'}:{today.isoformat()}"
+    summary = cache.get(key)
+    if summary is None:
+        summary = _build_dashboard_summary(today, class_id)
+        cache.set(key, summary, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return summary
+
+
+def _build_dashboard_summary(today, class_id):
+    week_days = [(today - timedelta(days=i)) for i in range(6, -1, -1)]
+
+    students = Student.objects.all()
+    summaries = DailyAttendanceSummary.objects.all()
+    records = Attendance.objects.all()
+    if class_id:
+        students = students.filter(student_class_id=class_id)
+        summaries = summaries.filter(course_id=class_id)
+        records = records.filter(student__student_class_id=class_id)
+
+    total_students = students.count()
+
+    # Attendance trend for the past 7 days from the daily summaries (one row per course and day)
+    presents_by_day = dict(
+        summaries.filter(date__range=(week_days[0], today))
+        .values_list('date')
+        .annotate(present=Sum('present_count'))
+        .order_by()
+    )
+    attendance_trend = [presents_by_day.get(day, 0) for day in week_days]
+    today_attendance = presents_by_day.get(today, 0)
+    absent_today = total_students - today_attendance
+
+    # Rankings only look at the recent window instead of the whole attendance history
+    recent = records.filter(date__range=(today - timedelta(days=settings.DASHBOARD_RANKING_DAYS - 1), today))
+    top_students = list(
+        recent.filter(status='Present')
+        .values('student_id', name=F('student__name'))
+        .annotate(presents=Count('id'))
+        .order_by('-presents', 'student_id')[:3]
+    )
+    frequent_absentees = list(
+        recent.filter(status='Absent')
+        .values('student_id', name=F('student__name'))
+        .annotate(absents=Count('id'))
+        .order_by('-absents', 'student_id')[:3]
+    )
+
+    return {
+        'total_students': total_students,
+        'today_attendance': today_attendance,
+        'absent_today': absent_today,
+        'attendance_trend': attendance_trend,
+        'week_days_labels': [d.strftime('%a') for d in week_days],
+        'pie_data': [today_attendance, absent_today],
+        'top_students': top_students,
+        'frequent_absentees': frequent_absentees,
+    }
@@ -1,40 +1,94 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from django.utils import timezone
-from attendance.models import AttendanceSchedule
-from attendance.take_attendance import take_attendance
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+from attendance.jobs import claim_job, default_worker_name, expire_jobs, heartbeat, requeue_jobs, run_job, sync_schedules
+from attendance.models import AttendanceJob
 import atexit
-from datetime import timedelta, datetime
+import threading
+import time
 import logging
 
 logger = logging.getLogger("scheduler")
 
-def run_scheduled_attendance():
-    now = timezone.localtime()
-    logger.info(now)
-    today = now.date()
-    current_time = now.time().replace(second=0, microsecond=0)
-    window_minutes = 2  # How many minutes back to check
-    window_start = (now - timedelta(minutes=window_minutes)).time().replace(second=0, microsecond=0)
-    window_end = current_time
-    
-    if window_start < window_end:
-        schedules = AttendanceSchedule.objects.filter(date=today, time__gte=window_start, time__lte=window_end)
-    else:
-        # If window_start > window_end,,, it means we've wrapped past midnight,,, fixed after lot of tries lol
-        schedules = AttendanceSchedule.objects.filter(date=today, time__gte=window_start) | AttendanceSchedule.objects.filter(date=today, time__lte=window_end)
-    for schedule in schedules.distinct():
-        logger.info(f"taking attandance for {schedule.camera.id} and course {schedule.course.id} at {schedule.time}")
-        # Ensure for_time is a time object, not a string
-        status, msg = take_attendance(schedule.camera.id, schedule.course.id, for_date=schedule.date)
-        if status:
-            logger.info(f"Attendance taken for camera {schedule.camera.id} and course {schedule.course.id} at {schedule.time}")
-            schedule.delete()  # Remove the schedule after completion.......
-        else:
-            logger.info(f"Failed to take attendance for camera {schedule.camera.id} and course {schedule.course.id}: {msg}")
+# Jobs run on a bounded pool so rooms starting at the same time don't queue behind each other
+_executor = None
+_lock = threading.Lock()
+_running = 0
+_cancel = threading.Event()  # set on shutdown: running sessions stop and no new jobs are claimed
+
+
+def max_sessions():
+    return max(int(getattr(settings, 'SCHEDULER_MAX_SESSIONS', 4)), 1)
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_sessions(), thread_name_prefix='attendance-session')
+        return _executor
+
+
+def _run(job):
+    global _running
+    try:
+        run_job(job, cancel=_cancel)
+    except Exception:
+        logger.exception(f"Job {job.id} crashed")
+    finally:
+        with _lock:
+            _running -= 1
+        connection.close()
+
+
+def run_scheduled_attendance(worker=None):
+    """Queue jobs for new schedules, then claim due jobs for every free session slot.
+    Claims go through the database, so any number of processes can run this safely."""
+    global _running
+    worker = worker or default_worker_name()
+    heartbeat(worker)
+    sync_schedules()
+    expire_jobs()
+    executor = get_executor()
+    while not _cancel.is_set():
+        with _lock:
+            if _running >= max_sessions():
+                break
+        job = claim_job(worker)
+        if job is None:
+            break
+        with _lock:
+            _running += 1
+        executor.submit(_run, job)
+
+
+def running_sessions():
+    with _lock:
+        return _running
+
+
+def stop_sessions(worker=None, grace=None):
+    """Shut down cleanly: cancel the running sessions without writing attendance and wait up to
+    `grace` seconds (default ATTENDANCE_SHUTDOWN_GRACE) for the session threads, which requeue
+    their own jobs. Only jobs whose session is still running after that are requeued here, so a
+    session that completes meanwhile keeps its outcome and no other worker opens its camera early."""
+    worker = worker or default_worker_name()
+    grace = settings.ATTENDANCE_SHUTDOWN_GRACE if grace is None else grace
+    _cancel.set()
+    get_executor().shutdown(wait=False)
+    deadline = time.monotonic() + grace
+    while running_sessions() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    requeued = requeue_jobs(AttendanceJob.objects.filter(worker=worker), "Requeued: worker shut down", refund=True)
+    if requeued:
+        logger.info(f"Requeued {requeued} jobs of stopping worker {worker} whose sessions did not stop in time")
+
 
 def start():
     scheduler = BackgroundScheduler()
-    scheduler.add_job(run_scheduled_attendance, 'interval', minutes=1, name='attendance_scheduler', max_instances=1)
+    scheduler.add_job(run_scheduled_attendance, 'interval', seconds=settings.ATTENDANCE_WORKER_POLL, name='attendance_scheduler', max_instances=1)
     scheduler.start()
     logger.info("Scheduler Started...")
     atexit.register(lambda: scheduler.shutdown())
+    atexit.register(stop_sessions)
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from attendance.models import Attendance, DailyAttendanceSummary, Student
+
+BATCH_SIZE = 500
+
+COUNTS = dict(
+    present=Count('id', filter=Q(status='Present')),
+    absent=Count('id', filter=Q(status='Absent')),
+)
+
+
+def _delta(old_status, new_status):
+    return (
+        (new_status == 'Present') - (old_status == 'Present'),
+        (new_status == 'Absent') - (old_status == 'Absent'),
+    )
+
+
+def apply_changes(for_date, changes):
+    """Incrementally update the daily summaries after attendance writes.
+    Args:
+        for_date (date): Date the attendance rows belong to
+        changes (list[tuple[int, str or None, str]]): (student ID, previous status or None, new status)"""
+    changes = [(student_id, old, new) for student_id, old, new in changes if old != new]
+    if not changes:
+        return
+    courses = dict(Student.objects.filter(id__in=[c[0] for c in changes]).values_list('id', 'student_class_id'))
+
+    daily = defaultdict(lambda: [0, 0])
+    for student_id, old, new in changes:
+        present, absent = _delta(old, new)
+        course_id = courses.get(student_id)
+        if course_id:
+            daily[course_id][0] += present
+            daily[course_id][1] += absent
+
+    with transaction.atomic():
+        DailyAttendanceSummary.objects.bulk_create(
+            [DailyAttendanceSummary(course_id=course_id, date=for_date) for course_id in daily],
+            ignore_conflicts=True,
+        )
+        for course_id, (present, absent) in daily.items():
+            if present or absent:
+                DailyAttendanceSummary.objects.filter(course_id=course_id, date=for_date).update(
+                    present_count=F('present_count') + present,
+                    absent_count=F('absent_count') + absent,
+                )
+
+
+def recount(for_date, student_ids):
+    """Recompute the summaries of the students' courses for one date from the attendance table.
+    Used for rows whose previous status is unknown, e.g. inserted rows that may have replaced
+    a row written concurrently. The summary rows are locked before counting, so concurrent
+    writers recount one after the other; only that date's rows of the courses are counted.
+    Args:
+        for_date (date): Date the attendance rows belong to
+        student_ids (list[int]): Students whose rows were written"""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    course_ids = set(
+        Student.objects.filter(id__in=student_ids, student_class__isnull=False)
+        .values_list('student_class_id', flat=True)
+    )
+    if not course_ids:
+        return
+
+    with transaction.atomic():
+        DailyAttendanceSummary.objects.bulk_create(
+            [DailyAttendanceSummary(course_id=course_id, date=for_date) for course_id in course_ids],
+            ignore_conflicts=True,
+        )
+        summaries = list(
+            DailyAttendanceSummary.objects.select_for_update()
+            .filter(course_id__in=course_ids, date=for_date).order_by('course_id')
+        )
+        daily = {
+            row['student__student_class_id']: row
+            for row in Attendance.objects.filter(student__student_class_id__in=course_ids, date=for_date)
+            .values('student__student_class_id').annotate(**COUNTS).order_by()
+        }
+        for summary in summaries:
+            row = daily.get(summary.course_id, {'present': 0, 'absent': 0})
+            summary.present_count, summary.absent_count = row['present'], row['absent']
+        DailyAttendanceSummary.objects.bulk_update(summaries, ['present_count', 'absent_count'], batch_size=BATCH_SIZE)
+
+
+def rebuild_summaries(course_ids=None):
+    """Recompute the daily summaries from the raw attendance table.
+    Args:
+        course_ids (list[int]): Only rebuild these courses (default: everything)
+        Returns: int: daily summary rows"""
+    records = Attendance.objects.all()
+    summaries = DailyAttendanceSummary.objects.all()
+    if course_ids is not None:
+        records = records.filter(student__student_class_id__in=course_ids)
+        summaries = summaries.filter(course_id__in=course_ids)
+
+    with transaction.atomic():
+        summaries.delete()
+        daily = DailyAttendanceSummary.objects.bulk_create(
+            [
+                DailyAttendanceSummary(course_id=row['student__student_class_id'], date=row['date'],
+                                       present_count=row['present'], absent_count=row['absent'])
+                for row in records.filter(student__student_class__isnull=False)
+                .values('student__student_class_id', 'date').annotate(**COUNTS).order_by()
+            ],
+            batch_size=BATCH_SIZE,
+        )
+    return len(daily)
@@ -1,41 +1,215 @@
-import os
-import cv2
-import numpy as np
-import face_recognition
+import contextlib
+import threading
+import time
+
+from django.conf import settings
 from django.utils import timezone
 from datetime import datetime, date
-from django.db import transaction
 import logging
 
-from attendance.models import Attendance, Student, Camera, Course
+from attendance.models import Student, Camera, Course
+from attendance.face_encodings import load_encodings
+from attendance.gallery import FaceGallery
+from attendance.pipeline import FramePipeline
+from attendance.capture import FrameGrabber
+from attendance.connections import acquire
+from attendance.engine import RecognitionEngine
+from attendance.tracking import FaceTracker
+from attendance.records import upsert_attendance
 
 logger = logging.getLogger("recognition")
 
 
-def parse_camera_address(address):
-    """Return int for webcam index, or str for URL/RTSP."""
-    try:
-        return int(address)
-    except (ValueError, TypeError):
-        return str(address)
+class SessionStats:
+    """Timing statistics of one recognition session, used to tune durations per course."""
+
+    def __init__(self, enrolled=0, duration=0):
+        self.enrolled = enrolled
+        self.recognized = 0
+        self.duration = duration
+        self.elapsed = 0.0
+        self.time_to_first_match = None
+        self.time_to_full_coverage = None
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_read = 0
+        self.frames_processed = 0
+        self.faces_encoded = 0
+        self.fps = 0.0
+        self.first_match_frame = None  # frame number of the first match (replay only)
+        self.stop_reason = None  # 'complete', 'idle', 'duration' or 'cancelled'; 'end' or 'max_frames' in a replay
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        first = f"{self.time_to_first_match:.1f}s" if self.time_to_first_match is not None else "-"
+        full = f"{self.time_to_full_coverage:.1f}s" if self.time_to_full_coverage is not None else "-"
+        return (
+            f"{self.recognized}/{self.enrolled} recognized in {self.elapsed:.1f}s "
+            f"(first match {first}, full coverage {full}, {self.fps:.1f} fps, stopped: {self.stop_reason})"
+        )
+
+
+class RecognitionSession:
+    """State shared by the recognition workers of one session: the course gallery,
+    the students recognized so far and the stop conditions."""
+
+    def __init__(self, gallery, duration, stop_when_complete=True, idle_timeout=0, cancel=None):
+        self.gallery = gallery
+        self.duration = duration
+        self.stop_when_complete = stop_when_complete
+        self.idle_timeout = idle_timeout
+        self.cancel = cancel  # threading.Event that aborts the session, e.g. on worker shutdown
+        self.enrolled_ids = {int(student_id) for student_id in gallery.ids}
+        self.recognized_ids = set()
+        self.stats = SessionStats(enrolled=len(self.enrolled_ids), duration=duration)
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self.start_time = self.last_match_time = time.monotonic()
+
+    def record(self, face_encodings):
+        """Match a frame's face encodings against the gallery and remember new students."""
+        self.record_matches(self.gallery.match(face_encodings))
+
+    def record_matches(self, matches):
+        """Remember new students from (student ID, distance) matches of one frame."""
+        with self._lock:
+            for student_id, distance in matches:
+                if student_id is None or student_id in self.recognized_ids:
+                    continue
+                self.recognized_ids.add(student_id)
+                self.last_match_time = time.monotonic()
+                if self.stats.time_to_first_match is None:
+                    self.stats.time_to_first_match = self.last_match_time - self.start_time
+                logger.info(f"Recognised student with ID: {student_id} (distance {distance:.3f})")
+
+            if self.enrolled_ids and self.stats.time_to_full_coverage is None and self.recognized_ids >= self.enrolled_ids:
+                self.stats.time_to_full_coverage = time.monotonic() - self.start_time
+                if self.stop_when_complete:
+                    self._stop('complete')
+
+    def finish(self, reason):
+        """Stop the session from outside, e.g. when a recorded video ends."""
+        with self._lock:
+            self._stop(reason)
+        self._update_stats()
+
+    def check_limits(self):
+        now = time.monotonic()
+        with self._lock:
+            if self.cancel is not None and self.cancel.is_set():
+                self._stop('cancelled')
+            elif now - self.start_time >= self.duration:
+                self._stop('duration')
+            elif self.idle_timeout and self.recognized_ids and now - self.last_match_time >= self.idle_timeout:
+                self._stop('idle')
+
+    def _stop(self, reason):
+        if not self.finished.is_set():
+            self.stats.stop_reason = reason
+            self.finished.set()
+
+    def wait(self, poll_interval=0.05, on_progress=None, progress_interval=1.0):
+        """Block until a stop condition is reached, calling on_progress(stats) periodically."""
+        last_report = time.monotonic()
+        while not self.finished.wait(poll_interval):
+            self.check_limits()
+            if on_progress and time.monotonic() - last_report >= progress_interval:
+                last_report = time.monotonic()
+                self._update_stats()
+                on_progress(self.stats)
+        self._update_stats()
+
+    def _update_stats(self):
+        with self._lock:
+            self.stats.elapsed = time.monotonic() - self.start_time
+            self.stats.recognized = len(self.recognized_ids)
+
 
+def _stage(timings, name):
+    return timings.stage(name) if timings is not None else contextlib.nullcontext()
 
-def take_attendance(camera_id, course_id, for_date=None, for_time=None, duration=20):
+
+def recognize_frame(frame, pipeline, session, tracker, engine=None, slot=0, timings=None):
+    """Detect the faces of one sampled frame, link them to the tracker's tracks and encode and
+    match only the unconfirmed ones; confirmed students are recorded in the session.
+    Args:
+        frame (np.ndarray): BGR frame
+        pipeline (FramePipeline): Detection and encoding settings and counters
+        session (RecognitionSession): Gallery and recognized students
+        tracker (FaceTracker): The calling worker's tracker
+        engine (RecognitionEngine): Process pool to run detection and matching in, if any
+        slot (int): The caller's engine slot
+        timings (StageTimings): Collects per-stage durations (see attendance.replay), if given"""
+    if engine is not None:
+        pipeline.mark_processed()
+        with _stage(timings, 'detect'):
+            face_locations = engine.detect(frame, slot=slot)
+    else:
+        with _stage(timings, 'detect'):
+            rgb_frame, face_locations = pipeline.detect_frame(frame)
+    tracks = tracker.update(face_locations)
+    pending = [(location, track) for location, track in zip(face_locations, tracks) if tracker.needs_encoding(track)]
+    if not pending:
+        return
+    locations = [location for location, _ in pending]
+    if engine is not None:
+        pipeline.count_encoded(len(locations))
+        with _stage(timings, 'encode_match'):
+            matches = engine.match_faces(locations, slot=slot)
+    else:
+        with _stage(timings, 'encode'):
+            encodings = pipeline.encode(rgb_frame, locations)
+        with _stage(timings, 'match'):
+            matches = session.gallery.match(encodings)
+    session.record_matches([
+        (student_id, distance)
+        for (_, track), (student_id, distance) in zip(pending, matches)
+        if tracker.observe(track, student_id, distance)
+    ])
+
+
+def recognition_worker(grabber, pipeline, session, engine=None, slot=0, confirmations=1):
+    """Consume frames from the grabber until the session finishes.
+    Faces are tracked across this worker's frames: only faces of unconfirmed tracks are
+    encoded and matched, and a student is recorded once a track matched them
+    `confirmations` times in a row. With an engine, detection and matching run in its
+    process pool using the given slot."""
+    tracker = FaceTracker(confirmations=confirmations)
+    while not session.finished.is_set():
+        frame = grabber.get(timeout=0.2)
+        if frame is None or not pipeline.should_process(frame):
+            continue
+        recognize_frame(frame, pipeline, session, tracker, engine, slot)
+
+
+def take_attendance(camera_id, course_id, for_date=None, for_time=None, duration=20,
+                    stop_when_complete=True, idle_timeout=None, on_progress=None, cancel=None):
     """Take attendance for a course using a camera.
     Args:
         camera_id (int): ID of the camera
         course_id (int): ID of the course
         for_date (str or date): Date for attendance (default: today)
         for_time (str or time): Time for attendance (default: now)
-        duration (int): Duration in seconds to run recognition (default: 10)
-        Returns: tuple[bool: status, str: message]"""
+        duration (int): Maximum duration in seconds to run recognition (default: 20)
+        stop_when_complete (bool): Stop as soon as every enrolled student was recognized
+        idle_timeout (float): Stop after this many seconds without a new recognition
+            (default: settings.RECOGNITION_IDLE_TIMEOUT, 0 disables)
+        on_progress (callable): Called about once a second with the SessionStats so far
+        cancel (threading.Event): Abort the session without writing attendance when set
+        Returns: tuple[bool: status, str: message, SessionStats: timing statistics]"""
+    if idle_timeout is None:
+        idle_timeout = getattr(settings, 'RECOGNITION_IDLE_TIMEOUT', 0)
+    stats = SessionStats()
+
     try:
         camera = Camera.objects.get(id=camera_id)
         course = Course.objects.get(id=course_id)
     except (Camera.DoesNotExist, Course.DoesNotExist):
         msg = f"Camera or Course not found: camera_id={camera_id}, course_id={course_id}"
         logger.error(msg)
-        return False, msg
+        return False, msg, stats
 
     if for_date is None:
         for_date = date.today()
@@ -44,88 +218,99 @@ def take_attendance(camera_id, course_id, for_date=None, for_time=None, duration
             for_date = datetime.strptime(for_date, "%Y-%m-%d").date()
         except ValueError:
             logger.error(f"Invalid date format: {for_date}")
-            return False, f"Invalid date format: {for_date}"
+            return False, f"Invalid date format: {for_date}", stats
 
     if for_time is None:
         for_time = datetime.now().time()
 
     students = Student.objects.filter(student_class=course)
-    face_data_dir = os.path.join('face_data')
-
-    known_encodings = []
-    known_ids = []
-    for student in students:
-        img_path_jpg = os.path.join(face_data_dir, f"{student.id}.jpg")
-        img_path_png = os.path.join(face_data_dir, f"{student.id}.png")
-
-        if os.path.exists(img_path_jpg):
-            img_path = img_path_jpg
-        elif os.path.exists(img_path_png):
-            img_path = img_path_png
-        else:
-            continue 
-
-        image = face_recognition.load_image_file(img_path)
-        encodings = face_recognition.face_encodings(image)
-        if encodings:
-            known_encodings.append(encodings[0])
-            known_ids.append(student.id)
-
-    recognized_ids = set()
-    
-    video = cv2.VideoCapture(parse_camera_address(camera.address))
-    if not video.isOpened():
-        video.release()
-        msg = f"Camera could not be opened, camera Adress: {camera.address}"
-        logger.error(msg)
-        return False, msg
+    known_encodings, known_ids = load_encodings(students)
+    gallery = FaceGallery(known_encodings, known_ids, tolerance=course.recognition_tolerance)
+    logger.info(f"Loaded {len(gallery)} face encodings of {gallery.student_count} students for course={course.name}")
 
-    start_time = datetime.now()
-    while (datetime.now() - start_time).total_seconds() < duration:
-        ret, frame = video.read()
-        if not ret or frame is None or frame.shape[0] == 0:
-            msg = f"Camera could not read frame, camera Adress: {camera.address}"
+    video = acquire(camera)
+    engine = grabber = session = None
+    threads = []
+    try:
+        if not video.wait_ready(settings.CAMERA_OPEN_TIMEOUT):
+            msg = f"Camera could not be opened, camera Adress: {camera.address}"
             logger.error(msg)
-            continue
+            return False, msg, stats
 
-        # small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        rgb_small_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        rgb_small_frame = np.ascontiguousarray(rgb_small_frame)
+        pipeline = FramePipeline.for_camera(camera)
+        process_workers = getattr(settings, 'RECOGNITION_PROCESS_WORKERS', 0)
+        if process_workers > 0:
+            # One feeding thread per worker process keeps every core busy
+            engine = RecognitionEngine(gallery, process_workers, detection_scale=pipeline.detection_scale, detector=pipeline.detector)
+            workers = engine.workers
+        else:
+            workers = max(int(getattr(settings, 'RECOGNITION_WORKER_THREADS', 1)), 1)
+        grabber = FrameGrabber(video, maxsize=max(workers, 2), name=camera.name).start()
+        confirmations = settings.RECOGNITION_CONFIRMATIONS
+        session = RecognitionSession(gallery, duration, stop_when_complete=stop_when_complete,
+                                     idle_timeout=idle_timeout, cancel=cancel)
+        for i in range(workers):
+            thread = threading.Thread(
+                target=recognition_worker, args=(grabber, pipeline, session, engine, i, confirmations),
+                name=f"recognition-{i}", daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
 
-        face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        def report_progress(stats):
+            stats.frames_processed = pipeline.frames_processed
+            stats.faces_encoded = pipeline.faces_encoded
+            stats.fps = pipeline.fps
+            on_progress(stats)
 
-        for face_encoding in face_encodings:
-            matches = face_recognition.compare_faces(known_encodings, face_encoding)
-            if True in matches:
-                index = matches.index(True)
-                recognized_ids.add(known_ids[index])
-                logger.info(f"Recognised student with ID: {known_ids[index]}")
+        session.wait(on_progress=report_progress if on_progress else None)
+    finally:
+        # Also runs when the session or a progress callback raised: stop the workers and free the camera
+        if session is not None:
+            session.finish('error')  # keeps the reason of a session that already stopped
+        for thread in threads:
+            thread.join()
+        if grabber is not None:
+            grabber.stop()
+        video.release()
+        if engine is not None:
+            engine.close()
 
-    video.release()
+    stats = session.stats
+    recognized_ids = session.recognized_ids
+    stats.frames_captured = grabber.frames_captured
+    stats.frames_dropped = grabber.frames_dropped
+    stats.frames_read = pipeline.frames_read
+    stats.frames_processed = pipeline.frames_processed
+    stats.faces_encoded = pipeline.faces_encoded
+    stats.fps = pipeline.fps
+    logger.info(
+        f"Captured {grabber.frames_captured} frames ({grabber.frames_dropped} dropped), "
+        f"processed {pipeline.frames_processed} of {pipeline.frames_read}, encoded {pipeline.faces_encoded} faces "
+        f"({pipeline.fps:.1f} fps processed, {pipeline.read_fps:.1f} fps read)"
+    )
     logger.info(f"Recognition complete. Recognized IDs: {recognized_ids}")
+    logger.info(f"Session stats for course={course.name}: {stats}")
+    if stats.stop_reason == 'cancelled':
+        # A partial session would mark everyone not seen yet absent
+        msg = "Session cancelled, attendance not written"
+        logger.info(msg)
+        return False, msg, stats
     if not recognized_ids:
         msg = f"Recognition failed or no faces detected"
         logger.info(msg)
-        return False, msg
+        return False, msg, stats
 
     aware_timestamp = timezone.make_aware(datetime.combine(for_date, for_time))
 
     try:
-        with transaction.atomic():
-            for student in students:
-                status = 'Present' if student.id in recognized_ids else 'Absent'
-                Attendance.objects.update_or_create(
-                    student=student,
-                    date=for_date,
-                    defaults={
-                        'status': status,
-                        'camera': camera,
-                        'timestamp': aware_timestamp
-                    }
-                )
+        statuses = {
+            student_id: 'Present' if student_id in recognized_ids else 'Absent'
+            for student_id in students.values_list('id', flat=True)
+        }
+        upsert_attendance(statuses, for_date, camera=camera, timestamp=aware_timestamp)
         logger.info(f"Attendance taken for course={course.name}, camera={camera.name}, date={for_date}")
-        return True, "Attendance taken successfully"
+        return True, f"Attendance taken successfully: {stats}", stats
     except Exception as e:
         logger.error(f"Attendance error: {e}")
-        return False, str(e)
+        return False, str(e), stats
@@ -1,3 +1,220 @@
+import io
+from datetime import date, timedelta
+from unittest import mock
+
+import numpy as np
+import openpyxl
 from django.test import TestCase
+from django.utils import timezone
+
+from attendance.capture import FrameGrabber
+from attendance.gallery import ENCODING_SIZE, FaceGallery
+from attendance.imports import import_students
+from attendance.jobs import claim_job, requeue_jobs, run_job
+from attendance.models import Attendance, AttendanceJob, Camera, Course, DailyAttendanceSummary, Student
+from attendance.records import upsert_attendance
+from attendance.summaries import rebuild_summaries, recount
+from attendance.take_attendance import SessionStats
+from attendance.tracking import FaceTracker
+
+
+def encoding(value):
+    return np.full(ENCODING_SIZE, value, dtype=np.float64)
+
+
+class SummaryTests(TestCase):
+    def setUp(self):
+        self.math = Course.objects.create(name='Math')
+        self.art = Course.objects.create(name='Art')
+        self.students = [
+            Student.objects.create(name=f"S{i}", student_class=course, roll_number=str(i))
+            for i, course in enumerate([self.math, self.math, self.math, self.art, self.art])
+        ]
+        self.ids = [student.id for student in self.students]
+
+    def snapshot(self):
+        # Incremental updates may leave zero rows that a rebuild does not create
+        return set(
+            DailyAttendanceSummary.objects.exclude(present_count=0, absent_count=0)
+            .values_list('course_id', 'date', 'present_count', 'absent_count')
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        today = date(2024, 3, 4)
+        yesterday = today - timedelta(days=1)
+        upsert_attendance({student_id: 'Present' for student_id in self.ids}, yesterday)
+        upsert_attendance({student_id: 'Absent' for student_id in self.ids[:3]}, today)
+        # Updates of existing rows, a new row and an unchanged row in one call
+        upsert_attendance({self.ids[0]: 'Present', self.ids[1]: 'Absent', self.ids[3]: 'Absent'}, today)
+        upsert_attendance({self.ids[2]: 'Absent', self.ids[4]: 'Present'}, yesterday)
+
+        incremental = self.snapshot()
+        rebuild_summaries()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertIn((self.math.id, today, 1, 2), incremental)
+        self.assertIn((self.art.id, yesterday, 2, 0), incremental)
+
+    def test_recount_includes_rows_written_concurrently(self):
+        today = date(2024, 3, 4)
+        upsert_attendance({self.ids[0]: 'Absent'}, today)
+        # Row inserted by another writer: upsert_attendance only sees it on the conflict path
+        Attendance.objects.create(student_id=self.ids[1], date=today, status='Absent')
+        recount(today, [self.ids[1]])
+
+        recounted = self.snapshot()
+        rebuild_summaries()
+        self.assertEqual(recounted, self.snapshot())
+        self.assertIn((self.math.id, today, 0, 2), recounted)
+
+
+class FaceGalleryTests(TestCase):
+    def test_match_picks_nearest_student(self):
+        gallery = FaceGallery([encoding(0.0), encoding(0.01), encoding(0.02)], [1, 2, 3], tolerance=0.6)
+        # Within tolerance of all three students, nearest to student 3
+        (student_id, distance), = gallery.match([encoding(0.019)])
+        self.assertEqual(student_id, 3)
+        self.assertAlmostEqual(distance, 0.001 * ENCODING_SIZE ** 0.5, places=4)
+
+    def test_match_uses_nearest_sample_of_each_student(self):
+        gallery = FaceGallery([encoding(0.0), encoding(0.5), encoding(0.03)], [1, 1, 2], tolerance=0.6)
+        self.assertEqual([student_id for student_id, _ in gallery.match([encoding(0.49), encoding(0.035)])], [1, 2])
+
+    def test_match_beyond_tolerance(self):
+        gallery = FaceGallery([encoding(0.0)], [1], tolerance=0.6)
+        self.assertEqual(gallery.match([encoding(0.1)])[0][0], None)
+        self.assertEqual(FaceGallery([], []).match([encoding(0.0)]), [(None, float('inf'))])
+
+
+class FaceTrackerTests(TestCase):
+    box = (10, 60, 60, 10)
+
+    def test_confirms_after_consecutive_matches(self):
+        tracker = FaceTracker(confirmations=3)
+        track, = tracker.update([self.box])
+        self.assertFalse(tracker.observe(track, 7, 0.3))
+        self.assertFalse(tracker.observe(track, 7, 0.3))
+        self.assertTrue(tracker.observe(track, 7, 0.2))
+        self.assertEqual(track.student_id, 7)
+        self.assertFalse(tracker.needs_encoding(track))
+
+    def test_interrupted_streak_starts_over(self):
+        tracker = FaceTracker(confirmations=2)
+        track, = tracker.update([self.box])
+        self.assertFalse(tracker.observe(track, 7, 0.3))
+        self.assertFalse(tracker.observe(track, 8, 0.3))
+        self.assertFalse(tracker.observe(track, None, 0.9))
+        self.assertFalse(tracker.observe(track, 7, 0.3))
+        self.assertFalse(track.confirmed)
+        self.assertTrue(tracker.observe(track, 7, 0.3))
+
+    def test_moving_face_keeps_its_track(self):
+        tracker = FaceTracker(confirmations=2)
+        track, = tracker.update([self.box])
+        tracker.observe(track, 7, 0.3)
+        moved, = tracker.update([(15, 65, 65, 15)])
+        self.assertIs(moved, track)
+        self.assertTrue(tracker.observe(moved, 7, 0.3))
+
+
+class ImportStudentsTests(TestCase):
+    def workbook(self, rows):
+        wb = openpyxl.Workbook()
+        for row in rows:
+            wb.active.append(row)
+        data = io.BytesIO()
+        wb.save(data)
+        data.seek(0)
+        return data
+
+    def test_report_rows(self):
+        course = Course.objects.create(name='Math')
+        Student.objects.create(name='Old', student_class=course, roll_number='1')
+        report = import_students(self.workbook([
+            ('Name', 'Class', 'Roll No', 'Photo'),
+            ('Ann', 'Math', '2', 'ann.jpg; ann2.jpg'),
+            ('Ben', 'Math', '1', None),
+            ('Cid', 'Physics', '3', None),
+            ('', 'Math', '4', None),
+            (None, None, None, None),
+            ('Dee', 'Math', '2', None),
+            ('Eve', 'Math', 5, None),
+        ]), batch_size=1)
+
+        self.assertEqual(report.added, 2)
+        self.assertEqual([row for row, _ in report.skipped], [3, 7])
+        self.assertEqual([row for row, _ in report.errors], [4, 5])
+        self.assertIn("Unknown class 'Physics'", report.errors[0][1])
+        ann = Student.objects.get(name='Ann')
+        self.assertEqual(ann.face_id, str(ann.id))
+        self.assertEqual(report.photos, {'ann.jpg': ann.id, 'ann2.jpg': ann.id})
+        self.assertTrue(Student.objects.filter(name='Eve', roll_number='5').exists())
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            import_students(self.workbook([('Name', 'Class')]))
+
+
+class ClaimJobTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Math')
+        self.camera = Camera.objects.create(name='Front', address='0')
+        self.other_camera = Camera.objects.create(name='Back', address='1')
+
+    def job(self, camera=None, run_at=None):
+        return AttendanceJob.objects.create(
+            camera=camera or self.camera, course=self.course, date=date.today(),
+            run_at=run_at or timezone.now() - timedelta(seconds=1),
+        )
+
+    def test_claims_due_pending_job(self):
+        self.job(run_at=timezone.now() + timedelta(hours=1))
+        due = self.job()
+        job = claim_job('w1')
+        self.assertEqual(job.id, due.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (AttendanceJob.RUNNING, 'w1', 1))
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNone(claim_job('w2'))
+
+    def test_skips_busy_camera(self):
+        self.job()
+        self.job()
+        other = self.job(camera=self.other_camera)
+        self.assertIsNotNone(claim_job('w1'))
+        self.assertEqual(claim_job('w2').id, other.id)
+        self.assertIsNone(claim_job('w3'))
+
+    def test_run_job_outcomes(self):
+        self.job()
+        job = claim_job('w1')
+        with mock.patch('attendance.jobs.take_attendance', return_value=(False, "Camera offline", SessionStats())):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AttendanceJob.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+
+        AttendanceJob.objects.filter(id=job.id).update(run_at=timezone.now())
+        job = claim_job('w1')
+        self.assertEqual(job.attempts, 2)
+        with mock.patch('attendance.jobs.take_attendance', return_value=(True, "Attendance taken", SessionStats())):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (AttendanceJob.DONE, "Attendance taken"))
+
+    def test_requeue_refunds_attempt(self):
+        self.job()
+        job = claim_job('w1')
+        requeue_jobs(AttendanceJob.objects.filter(id=job.id), "Requeued: worker shut down", refund=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.attempts), (AttendanceJob.PENDING, '', 0))
+        self.assertEqual(claim_job('w2').id, job.id)
+
 
-# Create your tests here.
+class FrameGrabberTests(TestCase):
+    def test_get_returns_newest_frame(self):
+        grabber = FrameGrabber(video=None, maxsize=3)
+        for value in range(3):
+            grabber.frames.append(np.full((2, 2), value))
+        self.assertEqual(grabber.get(timeout=0)[0, 0], 2)
+        self.assertEqual(grabber.frames_dropped, 2)
+        self.assertIsNone(grabber.get(timeout=0))
@@ -0,0 +1,131 @@
+"""Cross-frame face tracking for the recognition loop.
+Detected boxes are linked to the tracks of previous frames by overlap (IoU), falling back to
+centroid distance for faces that moved further than their size. Only faces of unconfirmed tracks
+are encoded, and a track's identity is confirmed after `confirmations` consecutive matches to the
+same student, which both saves the expensive encoding step and filters out one-off mismatches."""
+import itertools
+
+IOU_THRESHOLD = 0.3
+CENTROID_THRESHOLD = 0.5  # max centroid shift, as a fraction of the box diagonal
+MAX_MISSES = 5  # processed frames a track survives without a matching detection
+UNKNOWN_AFTER = 3  # failed matches before a track counts as an unknown face
+UNKNOWN_RETRY = 5  # unknown faces are re-encoded every this many frames
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(bottom - top, 0) * max(right - left, 0)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _centroid_shift(a, b):
+    """Distance between box centres relative to the diagonal of box a."""
+    dy = (a[0] + a[2]) / 2 - (b[0] + b[2]) / 2
+    dx = (a[1] + a[3]) / 2 - (b[1] + b[3]) / 2
+    diagonal = ((a[2] - a[0]) ** 2 + (a[1] - a[3]) ** 2) ** 0.5
+    return (dx * dx + dy * dy) ** 0.5 / diagonal if diagonal > 0 else float('inf')
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.misses = 0
+        self.candidate = None  # student ID of the current run of matches
+        self.streak = 0
+        self.student_id = None  # set once confirmed
+        self.distance = None
+        self.failed = 0  # consecutive frames without a gallery match
+        self.skipped = 0  # frames since an unknown face was last encoded
+
+    @property
+    def confirmed(self):
+        return self.student_id is not None
+
+
+class FaceTracker:
+    """Carries face identities across frames. Not thread-safe: use one tracker per worker."""
+
+    def __init__(self, confirmations=1, iou_threshold=IOU_THRESHOLD, max_misses=MAX_MISSES):
+        self.confirmations = max(int(confirmations), 1)
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, locations):
+        """Link a frame's face boxes to existing tracks, starting new tracks for new faces.
+        Returns: list[Track] aligned with locations"""
+        pairs = sorted(
+            ((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(locations)),
+            reverse=True,
+        )
+        assigned = [None] * len(locations)
+        used = set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t not in used and assigned[b] is None:
+                assigned[b] = self.tracks[t]
+                used.add(t)
+        # Fast movers: nearest remaining track by centroid
+        for b, box in enumerate(locations):
+            if assigned[b] is not None:
+                continue
+            candidates = [
+                (_centroid_shift(track.box, box), t) for t, track in enumerate(self.tracks) if t not in used
+            ]
+            shift, t = min(candidates, default=(float('inf'), None))
+            if shift <= CENTROID_THRESHOLD:
+                assigned[b] = self.tracks[t]
+                used.add(t)
+
+        kept = []
+        for t, track in enumerate(self.tracks):
+            if t not in used:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            kept.append(track)
+        for b, box in enumerate(locations):
+            if assigned[b] is None:
+                assigned[b] = Track(next(self._ids), box)
+                kept.append(assigned[b])
+            else:
+                assigned[b].box = box
+                assigned[b].misses = 0
+        self.tracks = kept
+        return assigned
+
+    def needs_encoding(self, track):
+        """Whether a tracked face should be encoded in this frame: never once confirmed, and only
+        every UNKNOWN_RETRY frames for faces that repeatedly matched nobody (e.g. visitors)."""
+        if track.confirmed:
+            return False
+        if track.failed < UNKNOWN_AFTER:
+            return True
+        track.skipped += 1
+        if track.skipped >= UNKNOWN_RETRY:
+            track.skipped = 0
+            return True
+        return False
+
+    def observe(self, track, student_id, distance):
+        """Record a gallery match for an unconfirmed track.
+        Returns: bool: True when this match confirms the track's identity"""
+        track.failed = track.failed + 1 if student_id is None else 0
+        if student_id is None or student_id != track.candidate:
+            track.candidate = student_id
+            track.streak = 1 if student_id is not None else 0
+        else:
+            track.streak += 1
+        if track.candidate is not None and track.streak >= self.confirmations:
+            track.student_id = track.candidate
+            track.distance = distance
+            return True
+        return False
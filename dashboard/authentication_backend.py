@@ -1,26 +1,49 @@
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from attendance.models import Admin
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import check_password
 
+
+def admin_cache_key(admin_id):
+    return f"auth:admin:{admin_id}"
+
+
+def admin_user(admin_id, username, password_hash):
+    # Create a dummy user object to use Django's authentication system. The password hash
+    # feeds the session auth hash, so changing an admin's password ends their other sessions.
+    user = User(username=username, password=password_hash, is_staff=True, is_superuser=True)
+    user.id = admin_id  # Map the ID to the Admin table
+    return user
+
+
 class AdminBackend(BaseBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
         try:
             admin = Admin.objects.get(username=username)
             if check_password(password, admin.password_hash):
-                # Create a dummy user object to use Django's authentication system
-                user = User(username=admin.username, is_staff=True, is_superuser=True)
-                user.id = admin.id  # Map the ID to the Admin table
-                return user
+                return admin_user(admin.id, admin.username, admin.password_hash)
         except Admin.DoesNotExist:
             return None
 
     def get_user(self, user_id):
-        try:
-            admin = Admin.objects.get(id=user_id)
-            # Create a dummy user object
-            user = User(username=admin.username, is_staff=True, is_superuser=True)
-            user.id = admin.id
-            return user
-        except Admin.DoesNotExist:
-            return None
+        """Resolve the session's admin, from the cache for ADMIN_CACHE_TIMEOUT seconds."""
+        key = admin_cache_key(user_id)
+        identity = cache.get(key)
+        if identity is None:
+            identity = Admin.objects.filter(id=user_id).values_list('username', 'password_hash').first()
+            if identity is None:
+                return None
+            cache.set(key, identity, timeout=settings.ADMIN_CACHE_TIMEOUT)
+        username, password_hash = identity
+        return admin_user(int(user_id), username, password_hash)
+
+
+@receiver(post_save, sender=Admin)
+@receiver(post_delete, sender=Admin)
+def forget_cached_admin(sender, instance, **kwargs):
+    """Drop the cached identity when an admin's username or password changes or it is deleted."""
+    cache.delete(admin_cache_key(instance.id))
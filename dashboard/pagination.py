@@ -0,0 +1,129 @@
+"""Keyset (seek) pagination for the dashboard listings.
+Pages are addressed by the sort key of the last/first row shown instead of an offset,
+so every page costs one indexed range query however deep it is."""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+SORT_FIELDS = ('id', 'name', 'roll_number', 'created_at')
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor, field=None):
+    """Return the [sort value, id] pair of a cursor, or None if it is missing or malformed.
+    With a model field, the sort value is converted to the field's type and a value the
+    field rejects makes the cursor malformed too."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not (isinstance(values, list) and len(values) == 2 and isinstance(values[1], int)):
+        return None
+    if field is not None:
+        try:
+            values[0] = field.to_python(values[0])
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if values[0] is None:
+            return None
+    return values
+
+
+class KeysetPage:
+    def __init__(self, items, sort_by, has_next, has_previous):
+        self.items = items
+        self.sort_by = sort_by
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def _cursor(self, item):
+        value = getattr(item, self.sort_by)
+        return encode_cursor([value.isoformat() if hasattr(value, 'isoformat') else value, item.id])
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.items[-1]) if self.has_next and self.items else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor(self.items[0]) if self.has_previous and self.items else None
+
+    def url(self, request, **cursor):
+        """Current URL with the pagination parameters replaced by the given cursor."""
+        query = request.GET.copy()
+        for key in ('after', 'before'):
+            query.pop(key, None)
+        for key, value in cursor.items():
+            query[key] = value
+        return f"{request.path}?{query.urlencode()}"
+
+    def links(self, request):
+        """URLs of the previous and next pages (None at either end), for templates and JSON."""
+        return {
+            'previous': self.url(request, before=self.previous_cursor) if self.previous_cursor else None,
+            'next': self.url(request, after=self.next_cursor) if self.next_cursor else None,
+        }
+
+
+def search_students(queryset, query):
+    """Filter students by name or roll number (or exact ID for a numeric query)."""
+    query = (query or '').strip()
+    if not query:
+        return queryset
+    condition = Q(name__icontains=query) | Q(roll_number__icontains=query)
+    if query.isdigit():
+        condition |= Q(id=int(query))
+    return queryset.filter(condition)
+
+
+def page_size_from(value):
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def keyset_page(queryset, sort_by='id', after=None, before=None, page_size=PAGE_SIZE):
+    """Return one page of the queryset ordered by (sort_by, id).
+    Args:
+        queryset (QuerySet): Rows to paginate
+        sort_by (str): One of SORT_FIELDS
+        after (str): Cursor of the last row of the previous page
+        before (str): Cursor of the first row of the next page (to go back)
+        page_size (int): Rows per page
+        Returns: KeysetPage"""
+    if sort_by not in SORT_FIELDS:
+        sort_by = 'id'
+    order = [sort_by, 'id'] if sort_by != 'id' else ['id']
+    # A cursor that does not fit the sort field (tampered with, or from another sort) is ignored
+    field = queryset.model._meta.get_field(sort_by)
+    after, before = decode_cursor(after, field), decode_cursor(before, field)
+
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+    if cursor is not None:
+        value, pk = cursor
+        op = 'lt' if backwards else 'gt'
+        if sort_by == 'id':
+            queryset = queryset.filter(**{f'id__{op}': pk})
+        else:
+            queryset = queryset.filter(Q(**{f'{sort_by}__{op}': value}) | Q(**{sort_by: value, f'id__{op}': pk}))
+    if backwards:
+        order = [f'-{field}' for field in order]
+
+    rows = list(queryset.order_by(*order)[:page_size + 1])
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+        return KeysetPage(rows, sort_by, has_next=True, has_previous=more)
+    return KeysetPage(rows, sort_by, has_next=more, has_previous=cursor is not None)
@@ -1,3 +1,86 @@
+from datetime import date
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from attendance.models import Admin, Course, DailyAttendanceSummary, Student
+from attendance.records import upsert_attendance
+from dashboard.pagination import encode_cursor
+
+
+class AdminTestCase(TestCase):
+    def setUp(self):
+        # The reports version is rolled back with each test, the figures cached under it are not
+        cache.clear()
+        admin = Admin.objects.create(username='admin', password_hash=make_password('secret'))
+        # Logging in updates last_login on the auth user mapped to the admin
+        User.objects.create(id=admin.id, username='admin')
+        self.assertTrue(self.client.login(username='admin', password='secret'))
+
+
+class StudentPaginationTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        course = Course.objects.create(name='Math')
+        self.ids = [
+            Student.objects.create(name=f"Student {i:02}", student_class=course, roll_number=str(i)).id
+            for i in range(7)
+        ]
+
+    def get(self, **params):
+        response = self.client.get('/students', {'format': 'json', 'page_size': 3, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def follow(self, url):
+        params = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        return self.get(**params)
+
+    def ids_of(self, page):
+        return [row['id'] for row in page['results']]
+
+    def test_forward_and_back(self):
+        for sort_by in ('id', 'name', 'created_at'):
+            with self.subTest(sort_by=sort_by):
+                first = self.get(sort_by=sort_by)
+                self.assertEqual(self.ids_of(first), self.ids[:3])
+                self.assertIsNone(first['previous'])
+                second = self.follow(first['next'])
+                self.assertEqual(self.ids_of(second), self.ids[3:6])
+                last = self.follow(second['next'])
+                self.assertEqual(self.ids_of(last), self.ids[6:])
+                self.assertIsNone(last['next'])
+                back = self.follow(last['previous'])
+                self.assertEqual(self.ids_of(back), self.ids[3:6])
+                self.assertEqual(self.ids_of(self.follow(back['previous'])), self.ids[:3])
+
+    def test_bad_cursor_is_ignored(self):
+        for sort_by, cursor in [
+            ('created_at', encode_cursor(['garbage', 1])),
+            ('created_at', encode_cursor([None, 1])),
+            ('id', encode_cursor(['garbage', 1])),
+            ('name', encode_cursor(['Student 01', 'x'])),
+            ('name', 'not a cursor'),
+        ]:
+            with self.subTest(sort_by=sort_by, cursor=cursor):
+                for direction in ('after', 'before'):
+                    page = self.get(sort_by=sort_by, **{direction: cursor})
+                    self.assertEqual(self.ids_of(page), self.ids[:3])
+
+
+class DeleteClassTests(AdminTestCase):
+    def test_dashboard_forgets_deleted_class(self):
+        course = Course.objects.create(name='Math')
+        student = Student.objects.create(name='Ann', student_class=course, roll_number='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_attendance({student.id: 'Present'}, date.today())
+        self.assertEqual(self.client.get('/').context['today_attendance'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/camera-and-courses', {'action': 'deleteclass', 'classroom_id': course.id})
+        self.assertFalse(DailyAttendanceSummary.objects.exists())
+        response = self.client.get('/')
+        self.assertEqual((response.context['total_students'], response.context['today_attendance']), (0, 0))
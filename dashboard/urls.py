@@ -6,6 +6,7 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('', views.dashboard_home, name='dashboard-home'),
     path('attendance', views.attendance, name='attendance'),
+    path('attendance/jobs/<int:job_id>', views.attendance_job_status, name='attendance-job-status'),
     path('students', views.students, name='students'),
     path('camera-and-courses', views.camera_courses, name='camera_and_courses'),
     path('schedule', views.schedule, name='schedule'),
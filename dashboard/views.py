@@ -1,24 +1,32 @@
-from datetime import date, datetime, timedelta
-import csv
-import io
-import os
+from datetime import date, datetime
+import zipfile
 
-from django.conf import settings as django_settings
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.hashers import make_password
 from django.core.files.storage import default_storage
-from django.db.models import Count, Q
-from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.utils.text import slugify
 from django.views.decorators.csrf import csrf_exempt
 
-import openpyxl
-# from asgiref.sync import async_to_sync
+from attendance.models import Student, Attendance, Course, Camera, AttendanceSchedule, AttendanceJob, DailyAttendanceSummary
+from attendance.jobs import enqueue_job
+from attendance.exports import LAYOUTS, attendance_rows, csv_response, xlsx_response
+from attendance.enrollment import enroll_zip
+from attendance.face_encodings import add_student_sample, save_student_image
+from attendance.imports import import_students
+from attendance.gallery import DEFAULT_TOLERANCE
+from attendance.reports import dashboard_summary, invalidate_reports
+from attendance.records import upsert_attendance
+from attendance.summaries import rebuild_summaries
+from dashboard.pagination import keyset_page, page_size_from, search_students
 
-from attendance.models import Student, Attendance, Course, Camera, AttendanceSchedule
-from attendance.take_attendance import take_attendance
+IMPORT_REPORT_ROWS = 20  # Skipped/failed rows listed after an import
 
 
 def login_view(request):
@@ -37,47 +45,11 @@ def login_view(request):
 @login_required(login_url='login')
 def dashboard_home(request):
     selected_class_id = request.GET.get('class')
-    today = date.today()
-    week_days = [(today - timedelta(days=i)) for i in range(6, -1, -1)]
-    week_days_labels = [d.strftime('%a') for d in week_days]
-
-    # Filter students by class if selected
-    students = Student.objects.all()
-    if selected_class_id:
-        students = students.filter(student_class_id=selected_class_id)
-
-    total_students = students.count()
-    today_attendance = Attendance.objects.filter(student__in=students, date=today, status='Present').count()
-    absent_today = total_students - today_attendance
-
-    # Attendance trend for the past 7 days
-    attendance_trend = [
-        Attendance.objects.filter(student__in=students, date=day, status='Present').count()
-        for day in week_days
-    ]
-
-    # Pie chart data
-    pie_data = [today_attendance, absent_today]
-
-    # Top 3 students with best attendance (most presents)
-    top_students = students.annotate(presents=Count('attendance', filter=Q(attendance__status='Present'))).order_by('-presents')[:3]
-    # Top 3 frequent absentees
-    frequent_absentees = students.annotate(absents=Count('attendance', filter=Q(attendance__status='Absent'))).order_by('-absents')[:3]
-
-    classes = Course.objects.all()
-
-    context = {
-        'total_students': total_students,
-        'today_attendance': today_attendance,
-        'absent_today': absent_today,
-        'attendance_trend': attendance_trend,
-        'week_days_labels': week_days_labels,
-        'pie_data': pie_data,
-        'top_students': top_students,
-        'frequent_absentees': frequent_absentees,
-        'classes': classes,
+    context = dict(dashboard_summary(date.today(), selected_class_id))
+    context.update({
+        'classes': Course.objects.all(),
         'selected_class_id': selected_class_id,
-    }
+    })
     return render(request, 'contents/dashboard.html', context)
 
 
@@ -100,7 +72,7 @@ def attendance(request):
     else:
         selected_date = date.today()
 
-    students = Student.objects.all().select_related('student_class').order_by('id')
+    students = Student.objects.all().select_related('student_class')
     if class_id:
         students = students.filter(student_class_id=class_id)
 
@@ -108,85 +80,147 @@ def attendance(request):
     message = None
     a_status = None
 
-    # Handle download action
+    # Handle download action: a date range (defaults to the selected day) streamed as CSV or XLSX
     if action == 'download':
         classroom_name = "all_classes"
         if class_id:
             classroom = Course.objects.filter(id=class_id).first()
             if classroom:
                 classroom_name = classroom.name.replace(" ", "_")
-        attendance_records = Attendance.objects.filter(student__in=students, date=selected_date)
-        attendance_map = {a.student.id: a.status for a in attendance_records}
-        filename = f"{classroom_name}_attendance_{selected_date}"
-        headers = ['Student ID', 'Name', 'Roll No', 'Status']
-        data_rows = [
-            [student.id, student.name, student.roll_number, attendance_map.get(student.id, '')]
-            for student in students
-        ]
+        start_date = parse_date(request.GET.get('start'), selected_date)
+        end_date = parse_date(request.GET.get('end'), start_date)
+        if end_date < start_date:
+            start_date, end_date = end_date, start_date
+        layout = request.GET.get('layout', 'matrix')
+        if layout not in LAYOUTS:
+            layout = 'matrix'
+        if start_date == end_date:
+            filename = f"{classroom_name}_attendance_{start_date}"
+        else:
+            filename = f"{classroom_name}_attendance_{start_date}_to_{end_date}"
+        rows = attendance_rows(students.order_by('id'), start_date, end_date, layout)
         if filetype == 'xlsx':
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(headers)
-            for row in data_rows:
-                ws.append(row)
-            output = io.BytesIO()
-            wb.save(output)
-            output.seek(0)
-            response = HttpResponse(output.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename="{filename}.xlsx"'
-            return response
-        else:  # default to CSV
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
-            writer = csv.writer(response)
-            writer.writerow(headers)
-            for row in data_rows:
-                writer.writerow(row)
-            return response
-
-    #POST: update attendance
-    if request.method == 'POST':
-        for student in students:
-            status = request.POST.get(f'status_{student.id}')
-            if status in ['Present', 'Absent']:
-                Attendance.objects.update_or_create(
-                    student=student,
-                    date=selected_date,
-                    defaults={'status': status}
-                )
-
-    # Handle manual take_attendance POST
+            return xlsx_response(rows, filename)
+        return csv_response(rows, filename)  # default to CSV
+
+    #POST: update attendance, writing only the statuses that changed
+    if request.method == 'POST' and request.POST.get('action') != 'take_attendance':
+        submitted = {}
+        for key, status in request.POST.items():
+            student_id = key[len('status_'):]
+            if key.startswith('status_') and student_id.isdigit() and status in ['Present', 'Absent']:
+                submitted[int(student_id)] = status
+        student_ids = set(students.values_list('id', flat=True))
+        current = dict(
+            Attendance.objects.filter(student__in=students, date=selected_date).values_list('student_id', 'status')
+        )
+        changes = {
+            student_id: status for student_id, status in submitted.items()
+            if student_id in student_ids and current.get(student_id) != status
+        }
+        changed = upsert_attendance(changes, selected_date)
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'changed': changed})
+        # Back to the same page of the listing, with the result message
+        query = request.GET.copy()
+        query['date'] = selected_date.isoformat()
+        query['status'] = True
+        query['message'] = f"{changed} attendance record{'s' if changed != 1 else ''} updated"
+        return redirect(f"{request.path}?{query.urlencode()}")
+
+    # Handle manual take_attendance POST: queue the session and let the page poll its status
     if request.method == 'POST' and request.POST.get('action') == 'take_attendance':
         course_id = request.POST.get('course')
         camera_id = request.POST.get('camera')
-        date_val = request.POST.get('date') or selected_date
-        a_status, result = take_attendance(camera_id, course_id, for_date=date_val)
-        # result = async_to_sync(take_attendance)(camera_id, course_id, for_date=date_val)
-
-        return redirect(f"{request.path}?class={course_id}&date={date_val}&status={a_status}&message={str(result)}")
-
-    # Get attendance records for the selected date
-    attendance_records = Attendance.objects.filter(student__in=students, date=selected_date)
-    attendance_map = {a.student.id: a.status for a in attendance_records}
-    for student in students:
+        date_val = request.POST.get('date') or selected_date.isoformat()
+        try:
+            job_date = datetime.strptime(str(date_val), "%Y-%m-%d").date()
+        except ValueError:
+            job_date = selected_date
+        if not (Course.objects.filter(id=course_id).exists() and Camera.objects.filter(id=camera_id).exists()):
+            return redirect(f"{request.path}?class={course_id}&date={date_val}&status=False&message=Camera or Course not found")
+        job = enqueue_job(camera_id, course_id, job_date)
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'job_id': job.id, 'status_url': reverse('attendance-job-status', args=[job.id])})
+        return redirect(f"{request.path}?class={course_id}&date={job_date}&job={job.id}")
+
+    # One page of students and their attendance for the selected date
+    search = request.GET.get('q', '').strip()
+    page = keyset_page(
+        search_students(students, search), request.GET.get('sort_by', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        page_size=page_size_from(request.GET.get('page_size')),
+    )
+    attendance_map = dict(
+        Attendance.objects.filter(student_id__in=[student.id for student in page.items], date=selected_date)
+        .values_list('student_id', 'status')
+    )
+    for student in page.items:
         student.attendance_status = attendance_map.get(student.id, "")
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'date': selected_date.isoformat(),
+            'results': [
+                {
+                    'id': student.id,
+                    'name': student.name,
+                    'roll_number': student.roll_number,
+                    'class': student.student_class.name if student.student_class else None,
+                    'status': student.attendance_status or None,
+                }
+                for student in page.items
+            ],
+            **page.links(request),
+        })
 
     # For class dropdown
     classes = Course.objects.all()
     a_status= request.GET.get('status') or a_status
     message = request.GET.get('message') or message
+    job_id = request.GET.get('job', '')
     context = {
         'default_date': selected_date.isoformat(),
-        'students': students,
+        'students': page.items,
+        'page_links': page.links(request),
+        'search': search,
         'attendance_map': attendance_map,
         'classes': classes,
         'selected_class_id': class_id or '',
         'cameras': cameras,
         "status": a_status,
         'message': message,
+        'job_id': job_id if job_id.isdigit() else '',
     }
     return render(request, 'contents/attendance.html', context)
 
+
+@login_required(login_url='login')
+def attendance_job_status(request, job_id):
+    """JSON status of a queued attendance session, polled by the attendance page."""
+    job = AttendanceJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'error': 'Job not found'}, status=404)
+    stats = job.stats or {}
+    finished = job.status in (AttendanceJob.DONE, AttendanceJob.FAILED)
+    if finished:
+        progress = 1.0
+    elif job.status == AttendanceJob.RUNNING and stats.get('duration'):
+        progress = min(stats.get('elapsed', 0) / stats['duration'], 0.99)
+    else:
+        progress = 0.0
+    return JsonResponse({
+        'id': job.id,
+        'status': job.status,
+        'finished': finished,
+        'success': job.status == AttendanceJob.DONE,
+        'attempts': job.attempts,
+        'progress': round(progress, 2),
+        'recognized': stats.get('recognized', 0),
+        'enrolled': stats.get('enrolled', 0),
+        'fps': round(stats.get('fps', 0.0), 1),
+        'message': job.message,
+    })
+
 @login_required(login_url='login')
 def students(request):
     class_id = request.GET.get('class')
@@ -194,8 +228,6 @@ def students(request):
     students = Student.objects.all().select_related('student_class')
     if class_id:
         students = students.filter(student_class_id=class_id)
-    if sort_by in ['id', 'name', 'roll_number', 'created_at']:
-        students = students.order_by(sort_by)
     classes = Course.objects.all()
 
     # Handle Add Student
@@ -215,15 +247,12 @@ def students(request):
             student.face_id = str(student.id)
             student.save()
 
-            # Save image if provided
+            # Save image if provided and store its face encoding, plus any extra samples
             if image_file:
-                folder = os.path.join(django_settings.BASE_DIR, 'face_data')
-                os.makedirs(folder, exist_ok=True)
-                filename = f"{student.id}.jpg"
-                filepath = os.path.join(folder, filename)
-                with open(filepath, 'wb+') as destination:
-                    for chunk in image_file.chunks():
-                        destination.write(chunk)
+                save_student_image(student, image_file)
+            for sample_file in request.FILES.getlist('samples'):
+                add_student_sample(student, sample_file)
+            invalidate_reports()
         return redirect(request.path + f'?class={class_id_val}&sort_by={sort_by}')
 
     # Handle Edit Student
@@ -235,21 +264,22 @@ def students(request):
         image_file = request.FILES.get('image')
         student = Student.objects.filter(id=student_id).first()
         if student:
+            previous_course_id = student.student_class_id
             student.name = name
             student.student_class = Course.objects.filter(id=class_id_val).first() if class_id_val else None
             student.roll_number = roll_no
             student.face_id = str(student.id)
             
-            # Save image if provided
+            # Save image if provided, replacing the stored face encoding; extra samples are added
             if image_file:
-                folder = os.path.join(django_settings.BASE_DIR, 'face_data')
-                os.makedirs(folder, exist_ok=True)
-                filename = f"{student.id}.jpg"
-                filepath = os.path.join(folder, filename)
-                with open(filepath, 'wb+') as destination:
-                    for chunk in image_file.chunks():
-                        destination.write(chunk)
+                save_student_image(student, image_file)
+            for sample_file in request.FILES.getlist('samples'):
+                add_student_sample(student, sample_file)
             student.save()
+            if previous_course_id != student.student_class_id:
+                # Past attendance now counts towards the new course
+                rebuild_summaries([c for c in (previous_course_id, student.student_class_id) if c])
+            invalidate_reports()
         return redirect(request.path + f'?class={class_id_val}&sort_by={sort_by}')
 
     # Handle Delete Student
@@ -257,59 +287,126 @@ def students(request):
         student_id = request.POST.get('student_id')
         student = Student.objects.filter(id=student_id).first()
         if student:
+            course_id = student.student_class_id
             student.delete()
+            if course_id:
+                rebuild_summaries([course_id])
+            invalidate_reports()
         return redirect(request.path + f'?class={class_id}&sort_by={sort_by}')
 
     # Handle Import Students from XLSX
     if request.method == 'POST' and request.POST.get('action') == 'import_xlsx':
         xlsx_file = request.FILES.get('xlsx_file')
-        import openpyxl
-        from django.contrib import messages
         if xlsx_file and xlsx_file.name.endswith('.xlsx'):
-            wb = openpyxl.load_workbook(xlsx_file)
-            ws = wb.active
-            header = [cell.value for cell in ws[1]]
-            # Expecting: Name | Class | Roll No
             try:
-                name_idx = header.index('Name')
-                class_idx = header.index('Class')
-                roll_idx = header.index('Roll No')
-            except ValueError:
-                messages.error(request, 'XLSX file must have columns: Name, Class, Roll No.')
+                report = import_students(xlsx_file)
+            except ValueError as e:
+                messages.error(request, str(e))
                 return redirect(request.path)
-            added = 0
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                name = row[name_idx]
-                class_name = row[class_idx]
-                roll_no = row[roll_idx]
-                if not (name and class_name and roll_no):
-                    continue
-                student_class = Course.objects.filter(name=class_name).first()
-                if not student_class:
-                    continue
-                # Prevent duplicate roll numbers in the same class
-                if Student.objects.filter(student_class=student_class, roll_number=roll_no).exists():
-                    continue
-                student = Student.objects.create(
-                    name=name,
-                    student_class=student_class,
-                    roll_number=roll_no
-                )
-                student.face_id = str(student.id)
-                student.save()
-                added += 1
-            messages.success(request, f"Imported {added} students from XLSX file.")
+            if report.added:
+                invalidate_reports()
+            report_messages(request, report, "Row")
+            photos_zip = request.FILES.get('photos_zip')
+            if photos_zip and report.photos:
+                enroll_photos(request, photos_zip, photo_map=report.photos)
         else:
             messages.error(request, 'Please upload a valid XLSX file.')
         return redirect(request.path)
 
+    # Handle bulk photo enrollment from a ZIP of photos named by roll number
+    if request.method == 'POST' and request.POST.get('action') == 'enroll_zip':
+        zip_file = request.FILES.get('zip_file')
+        course_id = request.POST.get('class', '')
+        course_id = course_id if course_id.isdigit() else None
+        if zip_file and zip_file.name.endswith('.zip'):
+            enroll_photos(request, zip_file, course_id=course_id)
+        else:
+            messages.error(request, 'Please upload a valid ZIP file.')
+        return redirect(request.path + (f'?class={course_id}' if course_id else ''))
+
+    search = request.GET.get('q', '').strip()
+    page = keyset_page(
+        search_students(students, search), sort_by,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        page_size=page_size_from(request.GET.get('page_size')),
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': [
+                {
+                    'id': student.id,
+                    'name': student.name,
+                    'class': student.student_class.name if student.student_class else None,
+                    'class_id': student.student_class_id,
+                    'roll_number': student.roll_number,
+                    'created_at': student.created_at.isoformat(),
+                }
+                for student in page.items
+            ],
+            **page.links(request),
+        })
+
     context = {
-        'students': students,
+        'students': page.items,
+        'page_links': page.links(request),
+        'search': search,
         'classes': classes,
         'selected_class_id': class_id or '',
     }
     return render(request, 'contents/students.html', context)
 
+def report_messages(request, report, label):
+    """Flash an import/enrollment report: the summary, then up to IMPORT_REPORT_ROWS problem rows."""
+    messages.success(request, str(report))
+    issues = sorted(report.errors + report.skipped)
+    for item, reason in issues[:IMPORT_REPORT_ROWS]:
+        messages.warning(request, f"{label} {item}: {reason}")
+    if len(issues) > IMPORT_REPORT_ROWS:
+        messages.warning(request, f"... and {len(issues) - IMPORT_REPORT_ROWS} more")
+
+
+def enroll_photos(request, zip_file, course_id=None, photo_map=None):
+    try:
+        report = enroll_zip(
+            zip_file, course_id=course_id, photo_map=photo_map,
+            workers=settings.WEB_ENROLL_WORKERS, max_photos=settings.WEB_ENROLL_MAX_PHOTOS,
+        )
+    except zipfile.BadZipFile:
+        messages.error(request, 'Please upload a valid ZIP file.')
+        return
+    except ValueError as e:
+        messages.error(request, f"{e} Enroll larger archives with 'python manage.py enroll_photos'.")
+        return
+    report_messages(request, report, "Photo")
+
+
+def parse_date(value, default):
+    """Parse a YYYY-MM-DD query value, falling back to default when missing or invalid."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_number(value, default, minimum, maximum, cast=float):
+    """Parse a number from a form, falling back to default when invalid or out of range."""
+    try:
+        number = cast(value)
+    except (TypeError, ValueError):
+        return default
+    return number if minimum <= number <= maximum else default
+
+
+def apply_camera_options(camera, data):
+    """Copy the recognition pipeline options from a form onto a camera."""
+    camera.detection_scale = parse_number(data.get('detection_scale'), camera.detection_scale, 0.1, 1.0)
+    camera.frame_interval = parse_number(data.get('frame_interval'), camera.frame_interval, 1, 100, cast=int)
+    camera.motion_threshold = parse_number(data.get('motion_threshold'), camera.motion_threshold, 0, 255)
+    camera.persistent_connection = data.get('persistent_connection') == 'on'
+    detector = data.get('detector')
+    if detector in dict(Camera.DETECTOR_CHOICES):
+        camera.detector = detector
+
 @login_required(login_url='login')
 def camera_courses(request):
     classrooms = Course.objects.all().order_by('id')
@@ -319,8 +416,9 @@ def camera_courses(request):
     if request.method == 'POST' and request.POST.get('action') == 'addclass':
         name = request.POST.get('name')
         description = request.POST.get('description')
+        tolerance = parse_number(request.POST.get('tolerance'), DEFAULT_TOLERANCE, 0.01, 1.0)
         if name:
-            Course.objects.create(name=name, description=description)
+            Course.objects.create(name=name, description=description, recognition_tolerance=tolerance)
         return redirect(request.path)
     
     # Handle Add Camera
@@ -328,7 +426,9 @@ def camera_courses(request):
         name = request.POST.get('name')
         cam_address = request.POST.get("cam_address")
         if name:
-            Camera.objects.create(name=name, address=cam_address)
+            camera = Camera(name=name, address=cam_address)
+            apply_camera_options(camera, request.POST)
+            camera.save()
         return redirect(request.path)
 
     # Handle Edit Classroom
@@ -340,6 +440,7 @@ def camera_courses(request):
         if classroom and name:
             classroom.name = name
             classroom.description = description
+            classroom.recognition_tolerance = parse_number(request.POST.get('tolerance'), classroom.recognition_tolerance, 0.01, 1.0)
             classroom.save()
         return redirect(request.path)
     
@@ -352,6 +453,7 @@ def camera_courses(request):
         if camera and name:
             camera.name = name
             camera.address = cam_address
+            apply_camera_options(camera, request.POST)
             camera.save()
         return redirect(request.path)
 
@@ -360,9 +462,12 @@ def camera_courses(request):
         classroom_id = request.POST.get('classroom_id')
         classroom = Course.objects.filter(id=classroom_id).first()
         if classroom:
-            # delete all students linked to this class
-            Student.objects.filter(student_class=classroom).delete()
-            classroom.delete()
+            with transaction.atomic():
+                # delete all students linked to this class, with their attendance and the class's summaries
+                Student.objects.filter(student_class=classroom).delete()
+                DailyAttendanceSummary.objects.filter(course=classroom).delete()
+                classroom.delete()
+                transaction.on_commit(invalidate_reports)
 
         return redirect(request.path)
     
@@ -377,6 +482,7 @@ def camera_courses(request):
     context = {
         'classrooms': classrooms,
         'cameras': cameras,
+        'detector_choices': Camera.DETECTOR_CHOICES,
     }
     return render(request, 'contents/camera_and_courses.html', context)
 
@@ -407,6 +513,7 @@ def schedule(request):
         schedule_id = request.POST.get('schedule_id')
         schedule_obj = AttendanceSchedule.objects.filter(id=schedule_id).first()
         if schedule_obj:
+            schedule_obj.jobs.filter(status=AttendanceJob.PENDING).delete()
             schedule_obj.delete()
         return redirect(request.path)
 